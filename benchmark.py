@@ -0,0 +1,350 @@
+"""Script for benchmarking Logs over synthetic multi-year logs
+
+Generates a constant file shaped like template.toml and a random log for
+each requested history length, then times every Logs entry point and a
+full UiComponents.display render with Streamlit replaced by a stub.
+Each history length is also opened by fresh processes to time the cold
+start and peak memory of a first render, with Streamlit stubbed so only
+this app's imports count, and of a script summarising the log without it.
+Results are written as json so runs on different commits can be compared:
+    python benchmark.py --days 365 1095 3650 --output benchmark.json
+"""
+
+import argparse
+import csv
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import types
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List
+
+import toml
+
+COLD_START = """
+import json, resource, sys, time
+start_time = time.perf_counter()
+sys.path.insert(0, {root!r})
+{body}
+total = time.perf_counter() - start_time
+# VmHWM is this process's own peak, ru_maxrss can carry the parent's
+try:
+    with open("/proc/self/status", encoding="utf-8") as status:
+        peak = next(int(line.split()[1]) for line in status
+                    if line.startswith("VmHWM:"))
+except OSError:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+# the streamlit stub has no file, only real imports count
+loaded = [name for name in ("numpy", "pandas", "streamlit")
+          if name in sys.modules and "__file__" in vars(sys.modules[name])]
+print(json.dumps({{
+    "import_s": imported, "total_s": total, "peak_rss_mb": peak / 1024,
+    "heavy_modules": loaded,
+}}))
+"""
+# a first render, with streamlit stubbed so only this app's imports count
+RENDER_START = """
+import benchmark
+benchmark.install_streamlit_stub()
+from ui_components import UiComponents
+imported = time.perf_counter() - start_time
+UiComponents.display()
+"""
+# a script summarising the log the way fleet_report does, without a stub
+SCRIPT_START = """
+from utilities import Logs
+imported = time.perf_counter() - start_time
+Logs.summary(user={user!r})
+"""
+WEEKDAYS = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday",
+            "Saturday", "Sunday"]
+USER = "benchmark@example.com"
+# the session state of the stub, cleared to start a new session
+SESSION_STATE: dict = {}
+
+
+class _StubContext:
+    """Stand-in for every Streamlit container, usable as a context manager
+    and offering the same calls as the stubbed module
+    """
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        return False
+
+    def __getattr__(self, name):
+        return getattr(sys.modules["streamlit"], name)
+
+
+def _stub_attribute(name: str) -> Callable:
+    """Returns the stand-in for a Streamlit call not stubbed explicitly,
+    buttons are never pressed
+    """
+
+    if name.endswith("button"):
+        return lambda *_, **__: False
+    return _stub_element
+
+
+def _stub_element(*_, **kwargs):
+    """Stand-in for a Streamlit call, returning the default value if any"""
+
+    if "value" in kwargs:
+        return kwargs["value"]
+    if "options" in kwargs:
+        return list(kwargs["options"])[0]
+    return _StubContext()
+
+
+def _stub_decorator(function=None, **_):
+    """Stand-in for Streamlit caching decorators"""
+    return function if function else lambda inner: inner
+
+
+class StubRerun(Exception):
+    """Raised by the stubbed st.experimental_rerun"""
+
+
+def _stub_rerun():
+    """Stand-in for st.experimental_rerun"""
+    raise StubRerun()
+
+
+def install_streamlit_stub() -> types.ModuleType:
+    """Replaces the streamlit module with a stub where forms are never
+    submitted and the session state is SESSION_STATE, returning the stub
+    """
+
+    stub = types.ModuleType("streamlit")
+    stub.experimental_user = {"email": USER}
+    stub.session_state = SESSION_STATE
+    stub.sidebar = _StubContext()
+    stub.experimental_memo = stub.experimental_singleton = _stub_decorator
+    stub.experimental_rerun = _stub_rerun
+    stub.columns = lambda spec, **_: [
+        _StubContext() for _ in range(spec if isinstance(spec, int)
+                                      else len(spec))]
+    stub.tabs = lambda names, **_: [_StubContext() for _ in names]
+    stub.checkbox = lambda *_, value=False, **__: value
+    stub.__getattr__ = _stub_attribute
+    sys.modules["streamlit"] = stub
+    return stub
+
+
+def generate_constant(tasks: int) -> dict:
+    """Returns constant data shaped like template.toml,
+    with the given number of tasks in each section
+    """
+
+    constant = {
+        "morning": [f"Morning{i}" for i in range(tasks - 1)] + ["Writes"],
+        "evening": [f"Evening{i}" for i in range(tasks - 1)] + ["Plan"],
+        "Special": {"Writes": ["w", "Benchmark string"], "Plan": ["p"]},
+    }
+    for number, day in enumerate(WEEKDAYS):
+        constant[day] = {
+            "general": [f"General{(number + i) % (tasks * 2)}"
+                        for i in range(tasks)],
+            "food": [f"Meal{(number + i) % (tasks * 2)}"
+                     for i in range(tasks)],
+        }
+    return constant
+
+
+def _random_row(rng: random.Random, constant: dict, day: datetime,
+                planned: str, churn: float) -> Dict[str, str]:
+    """Returns random values for the tasks of day, with the one-off
+    planned task added churn of the time
+    """
+
+    weekday = constant[day.strftime("%A")]
+    row = {column: rng.choice(["1", "1", "0", "-1", "None"])
+           for column in [
+               *[f"morning-{task}" for task in constant["morning"]],
+               *[f"evening-{task}" for task in constant["evening"]],
+               *[f"general-{task}" for task in weekday["general"]],
+               *[f"food-{task}" for task in weekday["food"]]]}
+    if rng.random() < churn:
+        row[f"planned-{planned}"] = rng.choice(["1", "0", "-1"])
+    return row
+
+
+def generate_log(path: str, constant: dict, days: int, churn: float,
+                 seed: int) -> None:
+    """Writes a wide log csv of days random days ending yesterday,
+    churn is the chance of a day having a new one-off planned task
+    """
+
+    rng = random.Random(seed)
+    end = datetime.now() - timedelta(days=1)
+    rows, columns = [], {}
+    for offset in range(days - 1, -1, -1):
+        day = end - timedelta(days=offset)
+        row = _random_row(rng=rng, constant=constant, day=day,
+                          planned=f"Planned{offset}", churn=churn)
+        columns.update(dict.fromkeys(row))
+        rows.append((day.strftime("%d/%m/%Y"), row))
+
+    with open(file=path, mode="w", encoding="utf-8", newline="") as file:
+        writer = csv.writer(file)
+        writer.writerow(["date", *columns])
+        for date, row in rows:
+            writer.writerow([date, *[row.get(column, "")
+                                     for column in columns]])
+
+
+def time_call(function: Callable, repeat: int,
+              setup: Callable = lambda: None) -> Dict[str, float]:
+    """Returns the min and median wall time of function over repeat runs,
+    setup is run untimed before each one
+    """
+
+    timings = []
+    for _ in range(repeat):
+        setup()
+        start_time = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - start_time)
+    return {"min_s": min(timings), "median_s": statistics.median(timings)}
+
+
+def run_case(days: int, args) -> List[dict]:
+    """Returns the timings of every operation for one history length"""
+
+    # imported after the stub is installed
+    # pylint: disable=import-outside-toplevel
+    from ui_components import UiComponents
+    from utilities import Logs
+
+    constant = generate_constant(tasks=args.tasks)
+    generate_log(path="bench_log.csv", constant=constant, days=days,
+                 churn=args.planned_churn, seed=args.seed)
+    Logs.set_constant(data=toml.dumps(constant).encode("utf-8"))
+    Logs.replace_log(path_or_buffer="bench_log.csv")
+
+    today = datetime.now().strftime("%d/%m/%Y")
+    Logs.config(date=today)
+    Logs.set_date(today)
+    values = iter(["1", "None"] * args.repeat * 4)
+
+    def new_session():
+        SESSION_STATE.clear()
+
+    operations = {
+        "config": lambda: Logs.config(date=today),
+        "basic_info": Logs.basic_info,
+        "get_actions": Logs.get_actions,
+        "get_action_value": lambda: Logs.get_action_value(
+            section="morning", name="Morning0"),
+        "set_action_value": lambda: Logs.set_action_value(
+            section="morning", name="Morning0", value=next(values)),
+        "projection": lambda: Logs.projection(horizon=365),
+        "display": UiComponents.display,
+    }
+    results = []
+    for name, operation in operations.items():
+        for mode, setup in (("cold", new_session), ("warm", lambda: None)):
+            operation()
+            results.append({"days": days, "operation": name, "mode": mode,
+                            **time_call(function=operation,
+                                        repeat=args.repeat, setup=setup)})
+    return results
+
+
+def cold_start(days: int, repeat: int, operation: str, body: str) -> dict:
+    """Returns the timings of fresh interpreters running body over the log
+    in the current directory, with their peak memory and which of numpy,
+    pandas and streamlit they imported
+    """
+
+    root = os.path.dirname(os.path.abspath(__file__))
+    runs = [json.loads(subprocess.run(
+        [sys.executable, "-c", COLD_START.format(root=root, body=body)],
+        check=True, capture_output=True, text=True).stdout.splitlines()[-1])
+        for _ in range(repeat)]
+    totals = [run["total_s"] for run in runs]
+    return {"days": days, "operation": operation, "mode": "process",
+            "min_s": min(totals), "median_s": statistics.median(totals),
+            "import_s": statistics.median(run["import_s"] for run in runs),
+            "peak_rss_mb": max(run["peak_rss_mb"] for run in runs),
+            "heavy_modules": runs[-1]["heavy_modules"]}
+
+
+def git_commit() -> str:
+    """Returns the current git commit, or an empty string outside git"""
+
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], check=True,
+                              capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))
+                              ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+
+def main() -> None:
+    """Parses the arguments, runs every case and writes the results"""
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--days", type=int, nargs="+",
+                        default=[365, 1095, 3650],
+                        help="history lengths to benchmark")
+    parser.add_argument("--tasks", type=int, default=5,
+                        help="tasks in each section of the constant file")
+    parser.add_argument("--planned-churn", type=float, default=0.3,
+                        help="chance of a day having a one-off planned task")
+    parser.add_argument("--repeat", type=int, default=5,
+                        help="timed runs of each operation")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default="benchmark.json",
+                        help="json file the results are written to")
+    args = parser.parse_args()
+
+    output = os.path.abspath(args.output)
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    install_streamlit_stub()
+    results = []
+    for days in args.days:
+        with tempfile.TemporaryDirectory() as directory:
+            os.chdir(directory)
+            SESSION_STATE.clear()
+            case = run_case(days=days, args=args)
+            case.append(cold_start(days=days, repeat=args.repeat,
+                                   operation="cold_start", body=RENDER_START))
+            case.append(cold_start(days=days, repeat=args.repeat,
+                                   operation="cold_script",
+                                   body=SCRIPT_START.format(user=USER)))
+            os.chdir(os.path.dirname(output))
+        for result in case:
+            print(f"{result['days']:>6} days  {result['operation']:<17}"
+                  f"{result['mode']:<5} median {result['median_s'] * 1e3:9.3f}"
+                  f" ms  min {result['min_s'] * 1e3:9.3f} ms")
+            if "peak_rss_mb" in result:
+                print(f"{'':>12}imports {result['import_s'] * 1e3:9.3f} ms"
+                      f"  peak rss {result['peak_rss_mb']:7.1f} MB  loaded "
+                      f"{', '.join(result['heavy_modules']) or 'none'}")
+        results.extend(case)
+
+    with open(file=output, mode="w", encoding="utf-8") as file:
+        json.dump({
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "storage": os.environ.get("DAY_TRACKER_STORAGE", "file"),
+            "parameters": {"tasks": args.tasks,
+                           "planned_churn": args.planned_churn,
+                           "repeat": args.repeat, "seed": args.seed},
+            "results": results,
+        }, file, indent=2)
+    print(f"Results written to {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""Script for recording a batch of task values into users' logs
+
+The batch is a csv with a user,date,section,task,value header, dates are
+dd/mm/YYYY and values are 1, 0, -1 or None, the rows of each user are
+recorded together with one write of the months they touch.
+
+Run from the directory holding the user files with:
+    python bulk_record.py batch.csv
+"""
+
+import argparse
+import csv
+import time
+from typing import Dict, List, Tuple
+
+from utilities import Logs
+
+HEADER = ["user", "date", "section", "task", "value"]
+Records = Dict[str, List[Tuple[str, str, str, str]]]
+
+
+def read_batch(path: str) -> Tuple[Records, int]:
+    """Returns the (date, section, task, value) records of a batch file
+    grouped by user, with the number of rows without exactly one field
+    for every header column
+    """
+
+    records: Records = {}
+    malformed = 0
+    with open(path, "r", newline="", encoding="utf-8") as file:
+        reader = csv.reader(file)
+        if next(reader, None) != HEADER:
+            raise ValueError(f"{path} does not start with the header "
+                             f"{','.join(HEADER)}")
+        for row in reader:
+            if not row:
+                continue
+            if len(row) != len(HEADER):
+                malformed += 1
+                continue
+            user, *record = row
+            records.setdefault(user, []).append(tuple(record))
+    return records, malformed
+
+
+def main() -> None:
+    """Parses the arguments and records the batch user by user"""
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("batch", help="csv file of the records")
+    args = parser.parse_args()
+
+    start_time = time.perf_counter()
+    batch, malformed = read_batch(path=args.batch)
+    if malformed:
+        print(f"{malformed} malformed rows rejected")
+    recorded = days = 0
+    rejected = malformed
+    for user, records in batch.items():
+        try:
+            report = Logs.record_batch(user=user, records=records)
+        except FileNotFoundError:
+            print(f"{user}: skipped, no constant file")
+            rejected += len(records)
+            continue
+        print(f"{user}: {report.recorded} recorded, {report.rejected} "
+              f"rejected, {report.days_added} days added, "
+              f"{report.months_written} months written "
+              f"in {report.seconds:.3f}s")
+        recorded += report.recorded
+        rejected += report.rejected
+        days += report.days_added
+    elapsed = time.perf_counter() - start_time
+    print(f"Recorded {recorded} and rejected {rejected} records for "
+          f"{len(batch)} users, adding {days} days, in {elapsed:.2f}s "
+          f"({recorded / elapsed if elapsed else 0:.0f} records/s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""Module for the parsed and cached constant file"""
+
+from typing import Dict, List, NamedTuple, Tuple
+
+import toml
+
+from filenames import current_user
+from instrumentation import timed
+from storage import get_backend
+from storage_backend import StorageBackend
+
+
+class DaySchedule(NamedTuple):
+    """Tasks specific to one day of the week"""
+
+    general: List[str]
+    food: List[str]
+
+
+class ConstantConfig(NamedTuple):
+    """Typed contents of the constant file, with the objective type and
+    extra arguments of every special task worked out in advance
+    """
+
+    morning: List[str]
+    evening: List[str]
+    days: Dict[str, DaySchedule]
+    special: Dict[str, list]
+    objectives: Dict[str, Tuple[str, dict]]
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "ConstantConfig":
+        """Method for creating the config from the loaded toml data"""
+
+        special = data.get("Special", {})
+        objectives = {}
+        for name, details in special.items():
+            if details and details[0] == "p":
+                objectives[name] = ("plan", {})
+            elif details and details[0] == "w":
+                objectives[name] = ("write", {"to_write": details[1]})
+
+        return cls(
+            morning=data["morning"],
+            evening=data["evening"],
+            days={day: DaySchedule(general=tasks["general"],
+                                   food=tasks["food"])
+                  for day, tasks in data.items()
+                  if isinstance(tasks, dict) and day != "Special"},
+            special=special,
+            objectives=objectives,
+        )
+
+    @classmethod
+    @timed("ConstantConfig.get")
+    def get(cls) -> "ConstantConfig":
+        """Method for getting the current user's config, the file is only
+        parsed again when it changes
+        """
+
+        # the session cache is the only use of streamlit, read needs none
+        # pylint: disable=import-outside-toplevel
+        import streamlit as st
+
+        backend = get_backend()
+        signature = backend.constant_signature()
+        key = f"config_{backend.user}"
+        cached = st.session_state.get(key)
+        if cached is None or cached[0] != signature:
+            cached = (signature, cls.read(backend=backend))
+            st.session_state[key] = cached
+        return cached[1]
+
+    @classmethod
+    def read(cls, backend: StorageBackend) -> "ConstantConfig":
+        """Method for parsing the constant file of a backend's user,
+        without the session cache so it works outside the app
+        """
+
+        return cls.from_dict(toml.loads(backend.read_constant()))
+
+    @classmethod
+    def invalidate(cls) -> None:
+        """Method for discarding the current user's cached config"""
+
+        # pylint: disable=import-outside-toplevel
+        import streamlit as st
+
+        st.session_state.pop(f"config_{current_user()}", None)
+
+    def day_columns(self, day: str) -> List[str]:
+        """Method for getting the log columns scheduled on a day"""
+
+        return [*[f"morning-{task}" for task in self.morning],
+                *[f"evening-{task}" for task in self.evening],
+                *[f"general-{task}" for task in self.days[day].general],
+                *[f"food-{task}" for task in self.days[day].food]]
+
+    def objective(self, name: str) -> Tuple[str, dict]:
+        """Method for getting the objective type and extra arguments
+        of a task
+        """
+
+        return self.objectives.get(name, ("basic", {}))
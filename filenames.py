@@ -1,18 +1,63 @@
 """Module for filenames"""
 
-import streamlit as st
+from typing import Optional
 
 
-def constant_file() -> str:
+def current_user() -> str:
+    """Returns the email of the user viewing the app"""
+
+    # scripts always name their users, so only the app imports streamlit
+    # pylint: disable=import-outside-toplevel
+    import streamlit as st
+
+    return st.experimental_user["email"]
+
+
+def constant_file(user: Optional[str] = None) -> str:
     """Returns the filename for the constant file matching the user"""
-    return st.experimental_user["email"] + "_constant.toml"
+    return (user or current_user()) + "_constant.toml"
+
+
+def log_file(user: Optional[str] = None) -> str:
+    """Returns the filename for the csv log file matching the user,
+    only used to migrate logs from before monthly partitions"""
+    return (user or current_user()) + "_log.csv"
+
+
+def log_partition_file(month: str, user: Optional[str] = None) -> str:
+    """Returns the filename for the binary log store of a YYYY-mm month
+    matching the user"""
+    return f"{user or current_user()}_log_{month}.bin"
 
 
-def log_file() -> str:
-    """Returns the filename for the log file matching the user"""
-    return st.experimental_user["email"] + "_log.csv"
+def partition_journal_file(month: str, user: Optional[str] = None) -> str:
+    """Returns the filename for the journal of a YYYY-mm month matching
+    the user"""
+    return f"{user or current_user()}_log_{month}_journal.csv"
 
 
-def planned_file() -> str:
+def checkpoint_file(user: Optional[str] = None) -> str:
+    """Returns the filename for the log checkpoints file matching the user"""
+    return (user or current_user()) + "_checkpoints.csv"
+
+
+def stats_file(user: Optional[str] = None) -> str:
+    """Returns the filename for the task statistics history matching the
+    user"""
+    return (user or current_user()) + "_stats.json"
+
+
+def month_stats_file(month: str, user: Optional[str] = None) -> str:
+    """Returns the filename for the task statistics of a YYYY-mm month
+    matching the user"""
+    return f"{user or current_user()}_stats_{month}.json"
+
+
+def planned_file(user: Optional[str] = None) -> str:
     """Returns the filename for the planned file matching the user"""
-    return st.experimental_user["email"] + "_planned.toml"
+    return (user or current_user()) + "_planned.toml"
+
+
+def lock_file(user: Optional[str] = None) -> str:
+    """Returns the filename for the lock file matching the user"""
+    return (user or current_user()) + ".lock"
@@ -0,0 +1,157 @@
+"""Script for reporting on every user's log at once
+
+Every user found in the storage chosen by DAY_TRACKER_STORAGE is
+summarised with Logs.summary in a pool of worker processes, then the
+summaries are printed with fleet-wide totals and the spread of progress.
+Summaries are kept in a cache next to the data signature of each user, so
+with --incremental only the users whose log or constant file changed
+since the last run are summarised again.
+
+Run from the directory holding the user files with:
+    python fleet_report.py --incremental --output report.json
+"""
+
+import argparse
+import json
+import os
+import statistics
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional
+
+from safe_files import atomic_write
+from storage import get_backend, list_users
+from utilities import Logs, UserSummary
+
+CACHE_VERSION = 1
+
+
+def summarise(user: str) -> Optional[UserSummary]:
+    """Returns the summary of a user's log, None when they have none"""
+
+    try:
+        return Logs.summary(user=user)
+    except FileNotFoundError:
+        return None
+
+
+def read_cache(path: str) -> Dict[str, dict]:
+    """Returns the cached signature and summary of every user by user,
+    nothing when there is no cache or it has another version
+    """
+
+    try:
+        with open(file=path, mode="r", encoding="utf-8") as file:
+            cache = json.load(file)
+    except FileNotFoundError:
+        return {}
+    return cache["users"] if cache.get("version") == CACHE_VERSION else {}
+
+
+def write_cache(path: str, signatures: Dict[str, str],
+                summaries: Dict[str, Optional[UserSummary]]) -> None:
+    """Replaces the cache with the signature and summary of every user"""
+
+    atomic_write(path=path, data=json.dumps({
+        "version": CACHE_VERSION,
+        "users": {user: {"signature": signatures[user],
+                         "summary": summary and summary._asdict()}
+                  for user, summary in summaries.items()},
+    }).encode("utf-8"))
+
+
+def fleet_summary(summaries: List[UserSummary]) -> dict:
+    """Returns the totals over every user's summary, with the completion
+    rates pooled over all tasks and averaged over users and the quartiles
+    of the users' progress
+    """
+
+    progress = sorted(summary.progress for summary in summaries)
+    scheduled = sum(summary.scheduled for summary in summaries)
+    return {
+        "users": len(summaries),
+        "days": sum(summary.days for summary in summaries),
+        "active_days": sum(summary.active_days for summary in summaries),
+        "scheduled": scheduled,
+        "recorded": sum(summary.recorded for summary in summaries),
+        "actioned": sum(summary.actioned for summary in summaries),
+        "completion_rate": sum(summary.actioned for summary in summaries)
+        / scheduled if scheduled else 0.0,
+        "mean_user_completion_rate": statistics.fmean(
+            summary.completion_rate for summary in summaries)
+        if summaries else 0.0,
+        "progress": {
+            "min": progress[0], "max": progress[-1],
+            "quartiles": statistics.quantiles(progress, n=4,
+                                              method="inclusive")
+            if len(progress) > 1 else progress * 3,
+        } if progress else None,
+    }
+
+
+def main() -> None:
+    """Parses the arguments, summarises the users that need it and prints
+    the report
+    """
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="worker processes summarising users")
+    parser.add_argument("--incremental", action="store_true",
+                        help="only summarise users whose data changed "
+                        "since the cached run")
+    parser.add_argument("--cache", default="fleet_report_cache.json",
+                        help="json file the summaries are cached in")
+    parser.add_argument("--output",
+                        help="json file the report is also written to")
+    args = parser.parse_args()
+
+    start_time = time.perf_counter()
+    users = list_users()
+    signatures = {user: get_backend(user=user).data_signature()
+                  for user in users}
+    cached = read_cache(path=args.cache) if args.incremental else {}
+    summaries: Dict[str, Optional[UserSummary]] = {
+        user: cached[user]["summary"] and UserSummary(
+            **cached[user]["summary"])
+        for user in users if user in cached
+        and cached[user]["signature"] == signatures[user]}
+    changed = [user for user in users if user not in summaries]
+    if changed:
+        with ProcessPoolExecutor(
+                max_workers=min(args.workers, len(changed))) as executor:
+            summaries.update(zip(changed, executor.map(
+                summarise, changed,
+                chunksize=max(1, len(changed) // (args.workers * 4)))))
+    write_cache(path=args.cache, signatures=signatures, summaries=summaries)
+
+    logged = [summaries[user] for user in users
+              if summaries[user] is not None]
+    for summary in logged:
+        print(f"{summary.user}: {summary.days} days from "
+              f"{summary.first_date} to {summary.last_date}, "
+              f"{summary.active_days} active, "
+              f"{summary.completion_rate:.1%} of tasks completed, "
+              f"progress {summary.progress:.3f}")
+    fleet = fleet_summary(summaries=logged)
+    print(f"{fleet['users']} users with a log, {fleet['days']} days, "
+          f"{fleet['active_days']} active, "
+          f"{fleet['completion_rate']:.1%} of tasks completed "
+          f"({fleet['mean_user_completion_rate']:.1%} per user on average)")
+    if fleet["progress"]:
+        quartiles = " / ".join(f"{value:.3f}" for value
+                               in fleet["progress"]["quartiles"])
+        print(f"Progress min {fleet['progress']['min']:.3f}, quartiles "
+              f"{quartiles}, max {fleet['progress']['max']:.3f}")
+    print(f"Summarised {len(changed)} of {len(users)} users in "
+          f"{time.perf_counter() - start_time:.2f}s")
+
+    if args.output:
+        with open(file=args.output, mode="w", encoding="utf-8") as file:
+            json.dump({"fleet": fleet,
+                       "users": [summary._asdict() for summary in logged],
+                       "skipped": len(users) - len(changed)}, file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
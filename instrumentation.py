@@ -0,0 +1,141 @@
+"""Module for opt-in instrumentation of the hot paths of a render"""
+
+import functools
+import json
+import logging
+import os
+import threading
+import time
+from typing import Callable, Optional
+
+LOGGER = logging.getLogger("day_tracker")
+
+
+class Instrumentation:
+    """Class collecting wall time, call counts, bytes read/written and
+    reruns for each script run, only when DAY_TRACKER_PROFILE=1 is set
+    """
+
+    ENABLED = os.environ.get("DAY_TRACKER_PROFILE", "") == "1"
+    _LOCAL = threading.local()
+
+    @classmethod
+    def _run(cls) -> Optional[dict]:
+        """Method for getting the record of this thread's script run"""
+        return getattr(cls._LOCAL, "run", None)
+
+    @classmethod
+    def start_run(cls) -> None:
+        """Method for starting the record of a script run"""
+
+        if cls.ENABLED:
+            cls._LOCAL.run = {"start": time.perf_counter(), "calls": {},
+                              "bytes_read": 0, "bytes_written": 0,
+                              "reruns": 0}
+
+    @classmethod
+    def record_call(cls, name: str, seconds: float) -> None:
+        """Method for recording one timed call"""
+
+        run = cls._run()
+        if run is not None:
+            calls = run["calls"].setdefault(name, {"count": 0, "seconds": 0})
+            calls["count"] += 1
+            calls["seconds"] += seconds
+
+    @classmethod
+    def count_bytes(cls, read: int = 0, written: int = 0) -> None:
+        """Method for recording bytes read from or written to storage files,
+        the SQLite backend's reads and writes are not counted
+        """
+
+        if cls.ENABLED:
+            run = cls._run()
+            if run is not None:
+                run["bytes_read"] += read
+                run["bytes_written"] += written
+
+    @classmethod
+    def count_rerun(cls) -> None:
+        """Method for recording a triggered rerun"""
+
+        run = cls._run()
+        if run is not None:
+            run["reruns"] += 1
+
+    @classmethod
+    def summary(cls) -> dict:
+        """Method for getting the record of the script run so far,
+        its bytes are those of the file backend only
+        """
+
+        run = cls._run()
+        if run is None:
+            return {}
+        return {
+            "wall_ms": round((time.perf_counter() - run["start"]) * 1e3, 3),
+            "bytes_read": run["bytes_read"],
+            "bytes_written": run["bytes_written"],
+            "reruns": run["reruns"],
+            "calls": {name: {"count": calls["count"],
+                             "ms": round(calls["seconds"] * 1e3, 3)}
+                      for name, calls in sorted(
+                          run["calls"].items(),
+                          key=lambda item: -item[1]["seconds"])},
+        }
+
+    @classmethod
+    def finish_run(cls) -> None:
+        """Method for logging the record of a script run as one json line"""
+
+        if cls._run() is not None:
+            LOGGER.info(json.dumps({"event": "render", **cls.summary()}))
+            cls._LOCAL.run = None
+
+    @classmethod
+    def display(cls) -> None:
+        """Method for displaying the record so far in the sidebar"""
+
+        if cls._run() is not None:
+            # pylint: disable=import-outside-toplevel
+            import streamlit as st
+
+            with st.sidebar.expander(label="Debug"):
+                st.json(cls.summary())
+
+
+# the record of each run is logged to stderr when enabled
+if Instrumentation.ENABLED and not LOGGER.handlers:
+    LOGGER.setLevel(logging.INFO)
+    LOGGER.addHandler(logging.StreamHandler())
+
+
+def timed(name: str) -> Callable:
+    """Decorator recording the wall time of every call to a function,
+    the function is returned unchanged when instrumentation is disabled
+    """
+
+    def decorator(function: Callable) -> Callable:
+        if not Instrumentation.ENABLED:
+            return function
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            start_time = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                Instrumentation.record_call(
+                    name=name, seconds=time.perf_counter() - start_time)
+        return wrapper
+    return decorator
+
+
+def rerun() -> None:
+    """Records and triggers a rerun of the script"""
+
+    # pylint: disable=import-outside-toplevel
+    import streamlit as st
+
+    Instrumentation.count_rerun()
+    st.experimental_rerun()
@@ -0,0 +1,155 @@
+"""Module for exporting the log in chunks"""
+
+import csv
+import io
+import zlib
+from bisect import bisect_left, bisect_right
+from typing import Iterator, List, NamedTuple, Optional, Tuple
+
+from instrumentation import timed
+from task_matrix import (UNRECORDED, UNSCHEDULED, TaskMatrix, month_key,
+                         sort_key)
+
+SECTIONS = ("morning", "evening", "general", "food", "planned")
+
+
+class ExportOptions(NamedTuple):
+    """Options of a log export, start and end are inclusive dd/mm/YYYY dates
+    and an empty sections tuple exports every section
+    """
+
+    start: Optional[str] = None
+    end: Optional[str] = None
+    sections: Tuple[str, ...] = ()
+    long_format: bool = False
+    compress: bool = False
+
+    @property
+    def file_name(self) -> str:
+        """Property for the file name of the export"""
+
+        name = "day_tracker_log_long" if self.long_format \
+            else "day_tracker_log"
+        return f"{name}.csv.gz" if self.compress else f"{name}.csv"
+
+    @property
+    def mime(self) -> str:
+        """Property for the mime type of the export"""
+        return "application/gzip" if self.compress else "text/csv"
+
+    def covers(self, month: str) -> bool:
+        """Method for checking if a YYYY-mm month has dates in the range"""
+
+        return (self.start is None or month >= month_key(self.start)) \
+            and (self.end is None or month <= month_key(self.end))
+
+
+class LogExport:
+    """Class for turning the months of a log into csv chunks, a month at a
+    time so only the months exported are ever loaded
+    """
+
+    @classmethod
+    def _rows(cls, matrix: TaskMatrix, options: ExportOptions) -> range:
+        """Method for getting the rows of the dates within the range"""
+
+        keys = [sort_key(date) for date in matrix.dates]
+        first = 0 if options.start is None \
+            else bisect_left(keys, sort_key(options.start))
+        last = len(keys) if options.end is None \
+            else bisect_right(keys, sort_key(options.end))
+        return range(first, max(first, last))
+
+    @classmethod
+    def _columns(cls, months: List[TaskMatrix],
+                 options: ExportOptions) -> List[str]:
+        """Method for getting the columns of the months in the sections,
+        in order of first appearance
+        """
+
+        columns = dict.fromkeys(column for matrix in months
+                                for column in matrix.columns)
+        return [column for column in columns if not options.sections
+                or column.split("-", 1)[0] in options.sections]
+
+    @classmethod
+    def _wide_block(cls, writer, matrix: TaskMatrix, rows: range,
+                    columns: List[str]) -> None:
+        """Method for writing the dates of rows as wide csv rows over
+        columns, blank where a column is not in the month
+        """
+
+        # pylint: disable=import-outside-toplevel
+        import numpy as np
+
+        positions = {column: i for i, column in enumerate(matrix.columns)}
+        cells = matrix.dense(start=rows.start, stop=rows.stop)
+        # a trailing unscheduled column stands in for the missing ones
+        cells = np.concatenate(
+            [cells, np.full((len(rows), 1), UNSCHEDULED, dtype=np.int8)],
+            axis=1)[:, [positions.get(column, -1) for column in columns]]
+        values = cells.astype(object)
+        values[cells == UNRECORDED] = "None"
+        values[cells == UNSCHEDULED] = ""
+        writer.writerows([date, *row] for date, row
+                         in zip(matrix.dates[rows.start:rows.stop],
+                                values.tolist()))
+
+    @classmethod
+    def _long_block(cls, writer, matrix: TaskMatrix, rows: range,
+                    columns: List[str]) -> None:
+        """Method for writing the scheduled tasks of the dates of rows as
+        (date, section, task, value) csv rows
+        """
+
+        selected = set(columns)
+        for row, col, value in zip(*matrix.entries(start=rows.start,
+                                                   stop=rows.stop)):
+            if matrix.columns[col] not in selected:
+                continue
+            section, task = matrix.columns[col].split("-", 1)
+            writer.writerow([matrix.dates[row], section, task,
+                             "None" if value == UNRECORDED else value])
+
+    @classmethod
+    def chunks(cls, months: List[TaskMatrix],
+               options: ExportOptions = ExportOptions()) -> Iterator[bytes]:
+        """Method for generating the export of the months of a log, in
+        order, as a chunk of bytes per month, gzip compressed as one stream
+        when options.compress is set
+        """
+
+        columns = cls._columns(months=months, options=options)
+        write_block = cls._long_block if options.long_format \
+            else cls._wide_block
+        compressor = zlib.compressobj(wbits=31) if options.compress else None
+
+        buffer = io.StringIO()
+        writer = csv.writer(buffer, lineterminator="\n")
+        writer.writerow(["date", "section", "task", "value"]
+                        if options.long_format else ["date", *columns])
+        for matrix in months:
+            rows = cls._rows(matrix=matrix, options=options)
+            if not rows:
+                continue
+            write_block(writer=writer, matrix=matrix, rows=rows,
+                        columns=columns)
+            chunk = buffer.getvalue().encode("utf-8")
+            buffer.seek(0)
+            buffer.truncate()
+            yield compressor.compress(chunk) if compressor else chunk
+        chunk = buffer.getvalue().encode("utf-8")
+        if compressor:
+            yield compressor.compress(chunk) + compressor.flush()
+        elif chunk:
+            yield chunk
+
+    @classmethod
+    @timed("LogExport.build")
+    def build(cls, months: List[TaskMatrix],
+              options: ExportOptions = ExportOptions()) -> bytes:
+        """Method for getting the whole export at once,
+        for consumers such as download buttons that need all of it
+        """
+
+        return b"".join(cls.chunks(months=months, options=options))
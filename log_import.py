@@ -0,0 +1,229 @@
+"""Module for merging uploaded logs into the stored log"""
+
+import csv
+import io
+import itertools
+from contextlib import contextmanager
+from datetime import datetime
+from typing import (Dict, Iterator, List, NamedTuple, Optional, TextIO, Tuple,
+                    Union)
+
+from constant_config import ConstantConfig
+from instrumentation import timed
+from task_matrix import UNRECORDED, TaskMatrix, sort_key
+
+NEWEST_WINS = "newest wins"
+KEEP_EXISTING = "keep existing"
+POLICIES = (NEWEST_WINS, KEEP_EXISTING)
+LONG_HEADER = ["date", "section", "task", "value"]
+VALUES = {"1": 1, "0": 0, "-1": -1, "1.0": 1, "0.0": 0, "-1.0": -1,
+          "None": "None"}
+
+Entry = Tuple[str, str, str]
+Value = Union[int, str]
+
+
+class ImportReport(NamedTuple):
+    """Report of a merge import, counted in (date, task) cells"""
+
+    inserted: int
+    updated: int
+    rejected: int
+
+
+class LogMerge(NamedTuple):
+    """Result of a merge import, changes maps each changed date to its new
+    (column, value) entries and matrix is set when the import adds dates,
+    which the stored months cannot take as single entries
+    """
+
+    report: ImportReport
+    changes: Dict[str, List[Tuple[str, Value]]]
+    matrix: Optional[TaskMatrix]
+
+
+class LogImport:
+    """Class for merging a wide or long log csv into a log matrix,
+    the csv is read and validated a chunk of rows at a time
+    """
+
+    CHUNK_ROWS = 1000
+
+    @classmethod
+    def _entries(cls, rows: Iterator[List[str]],
+                 header: List[str]) -> Iterator[List[Entry]]:
+        """Method for generating chunks of (date, column, value) entries
+        from the csv rows, empty wide cells are unscheduled and skipped
+        """
+
+        long_format = header == LONG_HEADER
+        while True:
+            chunk = list(itertools.islice(rows, cls.CHUNK_ROWS))
+            if not chunk:
+                return
+            if long_format:
+                yield [(row[0], f"{row[1]}-{row[2]}", row[3])
+                       if len(row) == 4 else ("", "", "") for row in chunk]
+            else:
+                yield [(row[0], column, value) for row in chunk
+                       for column, value in zip(header[1:], row[1:])
+                       if value != ""]
+
+    @classmethod
+    @contextmanager
+    def _open(cls, source) -> Iterator[TextIO]:
+        """Context manager for reading a csv path or binary buffer as text,
+        a buffer is left open for its owner
+        """
+
+        if isinstance(source, str):
+            with open(file=source, mode="r", encoding="utf-8",
+                      newline="") as file:
+                yield file
+            return
+        file = io.TextIOWrapper(source, encoding="utf-8", newline="")
+        try:
+            yield file
+        finally:
+            file.detach()
+
+    @classmethod
+    def validator(cls, matrix: TaskMatrix, config: ConstantConfig):
+        """Method for creating the check of one entry, which returns the
+        value of a valid entry and None otherwise
+
+        A date has to be a real date no later than the last logged date.
+        A task already in the log is accepted on any date, a new one has to
+        be planned or scheduled on that weekday by the constant file.
+        """
+
+        last = sort_key(matrix.dates[-1]) if matrix.dates else "99999999"
+        existing = set(matrix.columns)
+        weekdays: Dict[str, Optional[set]] = {}
+
+        def scheduled(date: str) -> Optional[set]:
+            if date not in weekdays:
+                try:
+                    day = datetime.strptime(date, "%d/%m/%Y").strftime("%A")
+                except ValueError:
+                    weekdays[date] = None
+                else:
+                    weekdays[date] = set(config.day_columns(day=day)) \
+                        if sort_key(date) <= last else None
+            return weekdays[date]
+
+        def validate(date: str, column: str, value: str) -> Optional[Value]:
+            columns = scheduled(date)
+            if columns is None or value not in VALUES:
+                return None
+            if column not in existing and column not in columns \
+                    and not column.startswith("planned-"):
+                return None
+            return VALUES[value]
+        return validate
+
+    @classmethod
+    def _merged_matrix(cls, matrix: TaskMatrix,
+                       changes: Dict[Tuple[str, str], Value]) -> TaskMatrix:
+        """Method for creating the log with the new dates and columns of
+        the changes added, dates kept in order
+        """
+
+        dates = sorted(set(matrix.dates).union(date for date, _ in changes),
+                       key=sort_key)
+        columns = list(dict.fromkeys(
+            [*matrix.columns, *(column for _, column in changes)]))
+        date_positions = {date: i for i, date in enumerate(dates)}
+        column_positions = {column: i for i, column in enumerate(columns)}
+
+        rows, cols, values = matrix.entries()
+        moved = [date_positions[date] for date in matrix.dates]
+        return TaskMatrix.from_entries(
+            dates=dates, columns=columns,
+            rows=[*(moved[row] for row in rows),
+                  *(date_positions[date] for date, _ in changes)],
+            cols=[*cols, *(column_positions[column] for _, column in changes)],
+            values=[*values, *(UNRECORDED if value == "None" else value
+                               for value in changes.values())])
+
+    @classmethod
+    def _cells(cls, source) -> Iterator[Entry]:
+        """Method for generating the (date, column, value) entries of a csv
+        path or binary buffer, read a chunk of rows at a time
+        """
+
+        with cls._open(source=source) as file:
+            rows = csv.reader(file)
+            header = next(rows, [])
+            if not header or header[0] != "date":
+                raise ValueError("The log has to start with a date column")
+            for chunk in cls._entries(rows=rows, header=header):
+                yield from chunk
+
+    @classmethod
+    def _current(cls, matrix: TaskMatrix, date: str,
+                 column: str) -> Optional[Value]:
+        """Method for getting the value of a cell of the log,
+        None when the date or task is not in it
+        """
+
+        try:
+            return matrix.value(date=date, column=column)
+        except KeyError:
+            return None
+
+    @classmethod
+    def _result(cls, matrix: TaskMatrix,
+                changes: Dict[Tuple[str, str], Value],
+                report: ImportReport) -> LogMerge:
+        """Method for grouping the changes by date, with the merged matrix
+        when they add dates
+        """
+
+        grouped: Dict[str, List[Tuple[str, Value]]] = {}
+        for (date, column), value in changes.items():
+            grouped.setdefault(date, []).append((column, value))
+        # a task new to the log is added by setting it,
+        # only a new date changes the shape of the log
+        dates = set(matrix.dates)
+        return LogMerge(
+            report=report, changes=grouped,
+            matrix=cls._merged_matrix(matrix=matrix, changes=changes)
+            if any(date not in dates for date in grouped) else None)
+
+    @classmethod
+    @timed("LogImport.merge")
+    def merge(cls, matrix: TaskMatrix, source, config: ConstantConfig,
+              policy: str = NEWEST_WINS) -> LogMerge:
+        """Method for merging a csv path or binary buffer into matrix,
+        with NEWEST_WINS imported values replace recorded ones and with
+        KEEP_EXISTING they only fill unrecorded and unscheduled tasks
+        """
+
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown conflict policy {policy}")
+
+        validate = cls.validator(matrix=matrix, config=config)
+        changes: Dict[Tuple[str, str], Value] = {}
+        inserted = updated = rejected = 0
+        for date, column, text in cls._cells(source=source):
+            value = validate(date, column, text)
+            if value is None:
+                rejected += 1
+                continue
+            current = cls._current(matrix=matrix, date=date, column=column)
+            if current is not None and (
+                    value == "None" or value == current
+                    or (current != "None" and policy == KEEP_EXISTING)):
+                continue
+            if (date, column) not in changes:
+                if current is None:
+                    inserted += 1
+                else:
+                    updated += 1
+            changes[date, column] = value
+
+        return cls._result(matrix=matrix, changes=changes,
+                           report=ImportReport(inserted=inserted,
+                                               updated=updated,
+                                               rejected=rejected))
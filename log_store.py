@@ -0,0 +1,83 @@
+"""Module for the binary storage of the log"""
+
+import json
+import os
+from array import array
+from typing import Tuple
+
+from instrumentation import Instrumentation, timed
+from safe_files import atomic_write
+from task_matrix import TaskMatrix
+
+MAGIC = b"DAYTRACKER-LOG"
+FORMAT_VERSION = 2
+
+
+class LogStore:
+    """Class for reading and writing a log matrix as one binary file,
+    a header line holding the date index, column dictionary and entry
+    count, padded to 8 bytes, followed by the raw indptr, col_ids and
+    values arrays of the matrix in native byte order
+    """
+
+    def __init__(self, path: str):
+        """Constructor method for the class"""
+        self._path = path
+
+    def signature(self) -> Tuple[int, int, int]:
+        """Method for getting the (inode, mtime, size) signature of the store
+        file, the inode changing with every save as saves rename a new file
+        over it
+        """
+
+        stat = os.stat(self._path)
+        return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+    @timed("LogStore.load")
+    def load(self) -> TaskMatrix:
+        """Method for loading the matrix"""
+
+        with open(file=self._path, mode="rb") as file:
+            magic = file.readline().rstrip(b"\n")
+            if magic != MAGIC:
+                raise ValueError(f"{self._path} is not a log store")
+            header = json.loads(file.readline())
+            if header["version"] != FORMAT_VERSION:
+                raise ValueError(f"Unsupported log store version "
+                                 f"{header['version']}")
+
+            arrays = {}
+            for name, typecode, length in (
+                    ("indptr", "q", len(header["dates"]) + 1),
+                    ("col_ids", "i", header["entries"]),
+                    ("values", "b", header["entries"])):
+                arrays[name] = array(typecode)
+                arrays[name].fromfile(file, length)
+            Instrumentation.count_bytes(read=file.tell())
+        return TaskMatrix(dates=header["dates"], columns=header["columns"],
+                          **arrays)
+
+    @timed("LogStore.save")
+    def save(self, matrix: TaskMatrix) -> None:
+        """Method for saving the matrix, written to a temporary file that is
+        synced and renamed over the store so a failed save or a crash never
+        leaves a partial store
+        """
+
+        header = json.dumps({"version": FORMAT_VERSION,
+                             "dates": matrix.dates, "columns": matrix.columns,
+                             "entries": len(matrix.values)}).encode("utf-8")
+        padding = -(len(MAGIC) + len(header) + 2) % 8
+        data = b"".join([MAGIC + b"\n", header + b" " * padding + b"\n",
+                         *(values.tobytes() for values in (
+                             matrix.indptr, matrix.col_ids, matrix.values))])
+        atomic_write(path=self._path, data=data)
+        Instrumentation.count_bytes(written=len(data))
+
+    def delete(self) -> None:
+        """Method for deleting the store file"""
+
+        try:
+            os.remove(self._path)
+        except FileNotFoundError:
+            pass
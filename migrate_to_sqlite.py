@@ -0,0 +1,83 @@
+"""Script for importing every file stored user into the SQLite backend
+
+The files are only read: a log still in a <email>_log.csv is imported from
+the csv as it is, without splitting it into monthly partitions first.
+
+Run from anywhere with:
+    python migrate_to_sqlite.py [directory] [--db day_tracker.db]
+"""
+
+import argparse
+import glob
+import os
+import time
+from typing import List
+
+from filenames import checkpoint_file, log_file
+from sqlite_storage import SQLiteBackend
+from storage import FileBackend
+from task_matrix import TaskMatrix
+
+SUFFIXES = ["_constant.toml", "_log.csv", "_checkpoints.csv",
+            "_planned.toml"]
+
+
+def find_users(directory: str) -> List[str]:
+    """Returns every user with a constant, log or planned file in directory"""
+
+    users = set()
+    for suffix in SUFFIXES:
+        for path in glob.glob(os.path.join(directory, f"*{suffix}")):
+            users.add(os.path.basename(path)[:-len(suffix)])
+    return sorted(users)
+
+
+def migrate_user(user: str, database: str) -> int:
+    """Imports one user's files into the database,
+    returning the number of log days imported
+    """
+
+    source = FileBackend(user=user)
+    target = SQLiteBackend(user=user, path=database)
+
+    try:
+        target.write_constant(data=source.read_constant().encode("utf-8"))
+    except FileNotFoundError:
+        pass
+    target.write_planned(tasks=source.read_planned())
+    # loading a log csv through the backend would migrate it in place
+    if os.path.exists(checkpoint_file(user)):
+        matrix = source.load_log()
+    elif os.path.exists(log_file(user)):
+        matrix = TaskMatrix.from_csv(path_or_buffer=log_file(user))
+    else:
+        return 0
+    target.write(matrix=matrix)
+    return len(matrix.dates)
+
+
+def main() -> None:
+    """Parses the arguments and imports every user found"""
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("directory", nargs="?", default=".",
+                        help="directory holding the user files")
+    parser.add_argument("--db", default="day_tracker.db",
+                        help="SQLite database to import into")
+    args = parser.parse_args()
+
+    database = os.path.abspath(args.db)
+    os.chdir(args.directory)
+    start_time = time.perf_counter()
+    users = find_users(directory=".")
+    days = 0
+    for user in users:
+        user_days = migrate_user(user=user, database=database)
+        print(f"{user}: {user_days} days")
+        days += user_days
+    print(f"Imported {len(users)} users and {days} days into {database} "
+          f"in {time.perf_counter() - start_time:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
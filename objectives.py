@@ -1,7 +1,10 @@
 """Module containing the classes for housing tasks"""
 
+from typing import Optional, Union
+
 import streamlit as st
 
+from instrumentation import rerun
 from utilities import Logs
 
 
@@ -9,12 +12,20 @@ from utilities import Logs
 class BasicObjective:
     """Basic class for housing a task"""
 
-    def __init__(self, section: str, name: str):
-        """Constructor method for the class"""
+    BATCHABLE = True
+    BATCH_OPTIONS = {"Skip": None, "Actioned": 1, "Undoable": 0,
+                     "Avoided": -1}
+
+    def __init__(self, section: str, name: str,
+                 value: Union[int, str, None] = None):
+        """Constructor method for the class, the value is looked up
+        in the log unless given
+        """
 
         self._section = section
         self._name = name
-        self._value = Logs.get_action_value(section=section, name=name)
+        self._value = Logs.get_action_value(section=section, name=name) \
+            if value is None else value
 
     def _extra_method(self):
         """Private method for subclassing,
@@ -42,7 +53,7 @@ class BasicObjective:
             Logs.set_action_value(section=self._section, name=self._name,
                                   value=-1)
         if any([good, medium, bad]):
-            st.experimental_rerun()
+            rerun()
 
     def _done_display(self):
         """Private method for displaying a task that had been done"""
@@ -60,7 +71,28 @@ class BasicObjective:
         if perform_undo:
             Logs.set_action_value(section=self._section, name=self._name,
                                   value="None")
-            st.experimental_rerun()
+            rerun()
+
+    @property
+    def name(self) -> str:
+        """The name of the task"""
+        return self._name
+
+    @property
+    def recorded(self) -> bool:
+        """Whether the task has a value yet"""
+        return self._value != "None"
+
+    def batch_display(self) -> Optional[int]:
+        """Method for displaying a task inside a section's batch form,
+        returning the chosen value or None if skipped
+        """
+
+        choice = st.radio(label=self._name, options=list(self.BATCH_OPTIONS),
+                          horizontal=True,
+                          key=f"batch_{self._section}_{self._name}")
+        self._extra_method()
+        return self.BATCH_OPTIONS[choice]
 
     def display(self):
         """Method for displaying a task"""
@@ -77,10 +109,11 @@ class WriteObjective(BasicObjective):
     underneath the name
     """
 
-    def __init__(self, section: str, name: str, to_write: str):
+    def __init__(self, section: str, name: str, to_write: str,
+                 value: Union[int, str, None] = None):
         """Constructor method for the subclass"""
 
-        super().__init__(section, name)
+        super().__init__(section, name, value)
         self._to_write = to_write
 
     def _extra_method(self):
@@ -97,6 +130,8 @@ class PlanObjective(BasicObjective):
     entering a list of values underneath the name
     """
 
+    BATCHABLE = False
+
     def _to_do_display(self):
         """Redefining of base class method
         redefined to include a text area for
@@ -118,4 +153,4 @@ class PlanObjective(BasicObjective):
                 {task for task in entered.split("\n") if task})
 
             Logs.set_planned_values(task_list=created_tasks)
-            st.experimental_rerun()
+            rerun()
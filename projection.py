@@ -0,0 +1,167 @@
+"""Module for projecting progress forward from the task statistics"""
+
+from datetime import datetime, timedelta
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from task_stats import WEEKDAYS, TaskStats
+
+PERCENTILES = (5, 25, 50, 75, 95)
+LEVELS = 1 << 16
+# (avoided, undoable, actioned) chances of a task, the outcomes -1, 0 and 1
+Outcomes = Tuple[float, float, float]
+
+
+class Projection(NamedTuple):
+    """Projected progress at the end of each date after the start date,
+    bands holding the values of every percentile across the paths by date
+    """
+
+    start_date: str
+    start_value: float
+    dates: List[str]
+    percentiles: Tuple[int, ...]
+    bands: List[List[float]]
+
+    def band(self, percentile: int) -> List[float]:
+        """Method for getting the projected values of a percentile"""
+        return self.bands[self.percentiles.index(percentile)]
+
+
+class Simulation(NamedTuple):
+    """Settings of a projection, the number of paths simulated horizon days
+    on, the task always actioned in a what-if scenario if any and the seed
+    of the uniforms every path is drawn from
+    """
+
+    horizon: int
+    paths: int = 10000
+    always: Optional[str] = None
+    seed: int = 0
+
+
+def task_outcomes(stats: TaskStats, weekday: int,
+                  pooled: TaskStats) -> Outcomes:
+    """Returns the chances of each outcome of a task on a weekday, the
+    actioned share of its recorded dates on that weekday with the rest
+    split like its other outcomes, from pooled when it was never recorded
+    """
+
+    if not stats.recorded:
+        stats = pooled
+    if not stats.recorded:
+        return 0.0, 1.0, 0.0
+    actioned = stats.actioned / stats.recorded
+    if stats.weekday_recorded[weekday]:
+        actioned = (stats.weekday_actioned[weekday]
+                    / stats.weekday_recorded[weekday])
+    missed = stats.undoable + stats.avoided
+    avoided = (1 - actioned) * stats.avoided / missed if missed else 0.0
+    return avoided, 1 - actioned - avoided, actioned
+
+
+def score_distribution(outcomes: List[Outcomes]):
+    """Returns the chances of every score from -len(outcomes) up to
+    len(outcomes) of a date whose tasks have outcomes, the sum of
+    independent tasks found by convolving their distributions
+    """
+
+    # pylint: disable=import-outside-toplevel
+    import numpy as np
+
+    distribution = np.ones(1)
+    for chances in outcomes:
+        distribution = np.convolve(distribution, chances)
+    return distribution
+
+
+def step_table(outcomes: List[Outcomes]):
+    """Returns the log progress step of a date whose tasks have outcomes
+    for each of the LEVELS values a 16 bit uniform takes, drawing its score
+    by inverse transform sampling
+    """
+
+    # pylint: disable=import-outside-toplevel
+    import numpy as np
+
+    cumulative = np.cumsum(score_distribution(outcomes))
+    # the progress rule, log1p of 0.01 times the score over the tasks
+    count = len(outcomes)
+    log_steps = np.log1p(0.01 * np.arange(-count, count + 1)
+                         / count).astype(np.float32)
+    levels = (np.arange(LEVELS) + 0.5) / LEVELS
+    return log_steps[np.minimum(
+        np.searchsorted(cumulative, levels, side="right"),
+        len(log_steps) - 1)]
+
+
+def log_percentiles(log_progress):
+    """Returns the PERCENTILES of the paths of each date of a dates by
+    paths array of log progress, sorting it in place
+    """
+
+    # pylint: disable=import-outside-toplevel
+    import numpy as np
+
+    # read off each date's sorted paths with numpy's linear interpolation
+    paths = log_progress.shape[1]
+    log_progress.sort(axis=1)
+    positions = np.array(PERCENTILES) / 100 * (paths - 1)
+    lower = np.floor(positions).astype(np.int64)
+    upper = np.minimum(lower + 1, paths - 1)
+    fraction = (positions - lower).astype(np.float32)
+    return (log_progress[:, lower] * (1 - fraction)
+            + log_progress[:, upper] * fraction).T.astype(np.float64)
+
+
+def project(stats: Dict[str, TaskStats], day_columns: Dict[str, List[str]],
+            start_date: str, start_value: float,
+            simulation: Simulation) -> Projection:
+    """Returns the percentiles of the progress of the paths of simulation
+    from start_value at the end of start_date, with the tasks in
+    day_columns by weekday name recorded like their statistics, or the
+    simulation's always task always actioned when given
+
+    The score of a date is the sum of its tasks' outcomes, so each weekday
+    has one score distribution and every date of every path is drawn from
+    it at once by inverse transform sampling, through a table holding the
+    log progress step of each of the LEVELS values a 16 bit uniform takes.
+    The same seed draws the same uniforms, so scenarios of one seed differ
+    only by their task chances.
+    """
+
+    # numpy is only needed when the projection is shown
+    # pylint: disable=import-outside-toplevel
+    import numpy as np
+
+    pooled = TaskStats(
+        actioned=sum(task.actioned for task in stats.values()),
+        undoable=sum(task.undoable for task in stats.values()),
+        avoided=sum(task.avoided for task in stats.values()))
+    days = [datetime.strptime(start_date, "%d/%m/%Y")
+            + timedelta(days=offset + 1)
+            for offset in range(simulation.horizon)]
+    weekdays = np.array([day.weekday() for day in days])
+
+    # a row of paths per date keeps every pass over contiguous memory
+    uniforms = np.random.default_rng(simulation.seed).integers(
+        0, LEVELS, size=(simulation.horizon, simulation.paths),
+        dtype=np.uint16)
+    steps = np.zeros((simulation.horizon, simulation.paths),
+                     dtype=np.float32)
+    for weekday in np.unique(weekdays).tolist():
+        columns = day_columns.get(WEEKDAYS[weekday], [])
+        if not columns:
+            continue
+        dates = np.flatnonzero(weekdays == weekday)
+        steps[dates] = step_table([
+            (0.0, 0.0, 1.0) if column == simulation.always
+            else task_outcomes(stats=stats.get(column, TaskStats()),
+                               weekday=weekday, pooled=pooled)
+            for column in columns])[uniforms[dates]]
+
+    # percentiles of the log progress are those of the progress
+    np.cumsum(steps, axis=0, out=steps)
+    bands = start_value * np.exp(log_percentiles(steps))
+    return Projection(start_date=start_date, start_value=start_value,
+                      dates=[day.strftime("%d/%m/%Y") for day in days],
+                      percentiles=PERCENTILES, bands=bands.tolist())
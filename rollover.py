@@ -0,0 +1,84 @@
+"""Module for rolling users' logs over to a new day in the background"""
+
+import threading
+import time
+from concurrent import futures
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Dict, Optional, Set
+
+from utilities import BackfillReport, Logs
+
+
+class Rollover:
+    """Class creating the days missing from users' logs on a background
+    thread pool, when a page finds its log behind and just after every
+    midnight for each user seen since the app started, so pages render
+    from days that are already there
+    """
+
+    WAIT = 0.5
+    WORKERS = 2
+    _EXECUTOR = ThreadPoolExecutor(max_workers=WORKERS,
+                                   thread_name_prefix="rollover")
+    _LOCK = threading.Lock()
+    _JOBS: Dict[str, "Future[Optional[BackfillReport]]"] = {}
+    _USERS: Set[str] = set()
+    _SCHEDULER: Optional[threading.Thread] = None
+
+    @classmethod
+    def watch(cls, user: str) -> None:
+        """Method for adding a user to those rolled over after midnight,
+        starting the scheduler thread the first time
+        """
+
+        with cls._LOCK:
+            cls._USERS.add(user)
+            if cls._SCHEDULER is None:
+                cls._SCHEDULER = threading.Thread(
+                    target=cls._run_at_midnight, name="rollover-scheduler",
+                    daemon=True)
+                cls._SCHEDULER.start()
+
+    @classmethod
+    def start(cls, user: str,
+              date: str) -> "Future[Optional[BackfillReport]]":
+        """Method for starting the rollover of a user's log to date,
+        returning the rollover already running for them if there is one
+        """
+
+        cls.watch(user=user)
+        with cls._LOCK:
+            job = cls._JOBS.get(user)
+            if job is None or job.done():
+                job = cls._EXECUTOR.submit(Logs.roll_over, user=user,
+                                           date=date)
+                cls._JOBS[user] = job
+        return job
+
+    @classmethod
+    def wait(cls, job: "Future[Optional[BackfillReport]]",
+             timeout: Optional[float] = None) -> bool:
+        """Method for waiting up to timeout seconds for a rollover,
+        returning whether it is done
+        """
+
+        done, _ = futures.wait([job], timeout=timeout)
+        return bool(done)
+
+    @classmethod
+    def _run_at_midnight(cls) -> None:
+        """Method for starting the rollover of every user seen so far just
+        after each midnight, run on the scheduler thread
+        """
+
+        while True:
+            now = datetime.now()
+            midnight = datetime.combine(now.date() + timedelta(days=1),
+                                        datetime.min.time())
+            time.sleep((midnight - now).total_seconds() + 1)
+            date = datetime.now().strftime("%d/%m/%Y")
+            with cls._LOCK:
+                users = sorted(cls._USERS)
+            for user in users:
+                cls.start(user=user, date=date)
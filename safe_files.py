@@ -0,0 +1,124 @@
+"""Module for crash-safe file writes and the read/write locks of users"""
+
+import os
+import tempfile
+import threading
+from contextlib import contextmanager
+from typing import Dict, Iterator, List
+
+try:
+    import fcntl
+except ImportError:  # Windows has no flock, locks stay within the process
+    fcntl = None
+
+
+def atomic_write(path: str, data: bytes) -> None:
+    """Replaces a file with data by writing it to a temporary file next to
+    it, syncing that to disk and renaming it over the file, so a crash
+    leaves either the old or the new file and never a partial one
+    """
+
+    directory = os.path.dirname(os.path.abspath(path))
+    descriptor, temporary_path = tempfile.mkstemp(
+        dir=directory, prefix=f".{os.path.basename(path)}.", suffix=".tmp")
+    try:
+        with os.fdopen(descriptor, "wb") as file:
+            file.write(data)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temporary_path, path)
+    except BaseException:
+        try:
+            os.remove(temporary_path)
+        except FileNotFoundError:
+            pass
+        raise
+    sync_directory(directory=directory)
+
+
+def sync_directory(directory: str) -> None:
+    """Syncs the entries of a directory to disk so a rename or removal in
+    it survives a crash, where the platform allows opening directories
+    """
+
+    try:
+        descriptor = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(descriptor)
+    except OSError:
+        pass
+    finally:
+        os.close(descriptor)
+
+
+# the lock state is shared by every holder, hold is the only entry point
+# pylint: disable=too-few-public-methods
+class FileLock:
+    """Class for read/write locks on lock files, shared for readers and
+    exclusive for writers, held with flock so they hold across the threads
+    and processes using the same lock file
+
+    A thread already holding a lock takes it again without waiting, a
+    shared hold asking for the exclusive lock is upgraded for as long as
+    it needs it, which other upgrades can get in before, so whatever was
+    read under the shared lock has to be checked again once upgraded.
+    """
+
+    _HELD = threading.local()
+    _FALLBACK: Dict[str, threading.RLock] = {}
+    _FALLBACK_GUARD = threading.Lock()
+
+    @classmethod
+    def _held(cls) -> Dict[str, List]:
+        """Method for getting the [descriptor, exclusive] of every lock
+        held by the current thread by path
+        """
+
+        if not hasattr(cls._HELD, "locks"):
+            cls._HELD.locks = {}
+        return cls._HELD.locks
+
+    @classmethod
+    @contextmanager
+    def hold(cls, path: str, exclusive: bool = True) -> Iterator[None]:
+        """Context manager holding the lock of a lock file, created if
+        needed, exclusively or shared with other readers
+        """
+
+        path = os.path.abspath(path)
+        if fcntl is None:
+            with cls._FALLBACK_GUARD:
+                lock = cls._FALLBACK.setdefault(path, threading.RLock())
+            with lock:
+                yield
+            return
+
+        held = cls._held()
+        if path in held:
+            entry = held[path]
+            if not exclusive or entry[1]:
+                yield
+                return
+            fcntl.flock(entry[0], fcntl.LOCK_EX)
+            entry[1] = True
+            try:
+                yield
+            finally:
+                fcntl.flock(entry[0], fcntl.LOCK_SH)
+                entry[1] = False
+            return
+
+        descriptor = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            fcntl.flock(descriptor,
+                        fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            held[path] = [descriptor, exclusive]
+            try:
+                yield
+            finally:
+                del held[path]
+        finally:
+            # closing the descriptor releases the flock
+            os.close(descriptor)
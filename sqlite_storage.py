@@ -0,0 +1,508 @@
+"""Module for the SQLite storage backend"""
+
+import json
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from typing import Dict, Hashable, Iterator, List, Optional, Tuple
+
+from instrumentation import timed
+from storage_backend import (Checkpoint, Entries, StorageBackend,
+                             matrix_checkpoints)
+from task_matrix import UNRECORDED, TaskMatrix, month_key
+from task_stats import TaskStats, decode_stats, encode_stats
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    user TEXT PRIMARY KEY,
+    revision INTEGER NOT NULL DEFAULT 0,
+    base_revision INTEGER NOT NULL DEFAULT 0,
+    constant TEXT,
+    constant_revision INTEGER NOT NULL DEFAULT 0,
+    planned TEXT NOT NULL DEFAULT '[]'
+);
+CREATE TABLE IF NOT EXISTS log_days (
+    user TEXT NOT NULL,
+    day TEXT NOT NULL,
+    PRIMARY KEY (user, day)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS log_tasks (
+    user TEXT NOT NULL,
+    task TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    PRIMARY KEY (user, task)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS log_values (
+    user TEXT NOT NULL,
+    day TEXT NOT NULL,
+    task TEXT NOT NULL,
+    value INTEGER,
+    revision INTEGER NOT NULL,
+    PRIMARY KEY (user, day, task)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS log_values_revision
+    ON log_values (user, revision);
+CREATE TABLE IF NOT EXISTS checkpoints (
+    user TEXT NOT NULL,
+    month TEXT NOT NULL,
+    min_day TEXT NOT NULL,
+    max_day TEXT NOT NULL,
+    log_progress REAL,
+    last_delta REAL,
+    cumulative REAL,
+    PRIMARY KEY (user, month)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS task_stats (
+    user TEXT NOT NULL,
+    month TEXT NOT NULL,
+    stats TEXT NOT NULL,
+    PRIMARY KEY (user, month)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS stats_history (
+    user TEXT PRIMARY KEY,
+    through TEXT NOT NULL,
+    stats TEXT NOT NULL
+);
+"""
+
+_LOCAL = threading.local()
+
+
+def to_day(date: str) -> str:
+    """Returns a dd/mm/YYYY log date as a sortable YYYY-mm-dd day"""
+    return f"{date[6:]}-{date[3:5]}-{date[:2]}"
+
+
+def to_date(day: str) -> str:
+    """Returns a YYYY-mm-dd day as a dd/mm/YYYY log date"""
+    return f"{day[8:]}/{day[5:7]}/{day[:4]}"
+
+
+def connect(path: str) -> sqlite3.Connection:
+    """Returns this thread's connection to the database at path,
+    opened in WAL mode with the schema created if needed, a forked process
+    opens its own as connections must not be shared across a fork
+    """
+
+    connections = getattr(_LOCAL, "connections", None)
+    if connections is None or _LOCAL.pid != os.getpid():
+        connections = _LOCAL.connections = {}
+        _LOCAL.pid = os.getpid()
+    if path not in connections:
+        connection = sqlite3.connect(path, timeout=30, isolation_level=None)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        connection.executescript(SCHEMA)
+        connections[path] = connection
+    return connections[path]
+
+
+# one public method for each operation of the interface
+# pylint: disable=too-many-public-methods
+class SQLiteBackend(StorageBackend):
+    """Storage backend keeping every user in one SQLite database,
+    the log is stored as one (user, day, task, value) row per scheduled
+    task next to a checkpoint and a task statistics row per month, every
+    write is a transaction that bumps the user's revision
+    """
+
+    def __init__(self, user: str, path: str):
+        """Constructor method for the class"""
+
+        super().__init__(user=user)
+        self._path = path
+        self._months: Dict[str, int] = {}
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        """Context manager for a write transaction on the user's row"""
+
+        connection = connect(self._path)
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            connection.execute("INSERT OR IGNORE INTO users (user) VALUES (?)",
+                               (self.user,))
+            yield connection
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        connection.execute("COMMIT")
+
+    def _user_row(self, columns: str) -> Optional[tuple]:
+        """Method for reading columns of the user's row"""
+
+        return connect(self._path).execute(
+            f"SELECT {columns} FROM users WHERE user = ?",  # nosec
+            (self.user,)).fetchone()
+
+    def _bump_revision(self, connection: sqlite3.Connection,
+                       rebase: bool = False) -> int:
+        """Method for incrementing the user's revision inside a transaction,
+        rebase marks that readers have to load the whole log again
+        """
+
+        revision = connection.execute(
+            "SELECT revision FROM users WHERE user = ?",
+            (self.user,)).fetchone()[0] + 1
+        connection.execute(
+            "UPDATE users SET revision = ?"
+            + (", base_revision = ?" if rebase else "")
+            + " WHERE user = ?",
+            (revision, revision, self.user) if rebase
+            else (revision, self.user))
+        return revision
+
+    def _entries_matrix(self, days: List[str], query: str,
+                        parameters: tuple) -> TaskMatrix:
+        """Method for creating a matrix of the days from the (day, task,
+        value, position) rows of a query, columns ordered by position
+        """
+
+        rows = connect(self._path).execute(query, parameters).fetchall()
+        positions = sorted({(position, task)
+                            for _, task, _, position in rows})
+        columns = [task for _, task in positions]
+        day_positions = {day: i for i, day in enumerate(days)}
+        column_positions = {column: i for i, column in enumerate(columns)}
+        return TaskMatrix.from_entries(
+            dates=[to_date(day) for day in days], columns=columns,
+            rows=[day_positions[day] for day, _, _, _ in rows],
+            cols=[column_positions[task] for _, task, _, _ in rows],
+            values=[UNRECORDED if value is None else value
+                    for _, _, value, _ in rows])
+
+    def _load(self, month: Optional[str] = None) -> TaskMatrix:
+        """Method for loading the log of the user, only a YYYY-mm month
+        of it if given
+        """
+
+        first, last = (f"{month}-00", f"{month}-99") if month \
+            else ("", "9999")
+        days = [day for day, in connect(self._path).execute(
+            "SELECT day FROM log_days WHERE user = ? AND day BETWEEN ? AND ? "
+            "ORDER BY day", (self.user, first, last))]
+        return self._entries_matrix(
+            days=days,
+            query="SELECT v.day, v.task, v.value, t.position "
+                  "FROM log_values v JOIN log_tasks t "
+                  "ON t.user = v.user AND t.task = v.task "
+                  "WHERE v.user = ? AND v.day BETWEEN ? AND ?",
+            parameters=(self.user, first, last))
+
+    def _revisions(self) -> Tuple[int, int]:
+        """Method for getting the revision and base revision of the user,
+        raises FileNotFoundError when the user has no log
+        """
+
+        row = self._user_row(columns="revision, base_revision")
+        if row is None or row[1] == 0:
+            raise FileNotFoundError(f"No log stored for {self.user}")
+        return row
+
+    @classmethod
+    def _insert_checkpoints(cls, connection: sqlite3.Connection, user: str,
+                            checkpoints: List[Checkpoint]) -> None:
+        """Method for inserting or replacing checkpoints of a user"""
+
+        connection.executemany(
+            "INSERT OR REPLACE INTO checkpoints (user, month, min_day, "
+            "max_day, log_progress, last_delta, cumulative) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            [(user, checkpoint.month, to_day(checkpoint.min_date),
+              to_day(checkpoint.max_date), *checkpoint[3:])
+             for checkpoint in checkpoints])
+
+    @classmethod
+    def _invalidate_checkpoints(cls, connection: sqlite3.Connection,
+                                user: str, month: str) -> None:
+        """Method for clearing the progress of a changed month and the
+        cumulative progress from it onwards
+        """
+
+        connection.execute(
+            "UPDATE checkpoints SET log_progress = NULL, last_delta = NULL "
+            "WHERE user = ? AND month = ? AND log_progress IS NOT NULL",
+            (user, month))
+        connection.execute(
+            "UPDATE checkpoints SET cumulative = NULL "
+            "WHERE user = ? AND month >= ? AND cumulative IS NOT NULL",
+            (user, month))
+
+    @timed("SQLiteBackend.load_log")
+    def load_log(self) -> TaskMatrix:
+        self._revisions()
+        return self._load()
+
+    @timed("SQLiteBackend.sync_month")
+    def sync_month(self, month: str,
+                   matrix: Optional[TaskMatrix]) -> TaskMatrix:
+        revision, base_revision = self._revisions()
+        seen = self._months.get(month)
+        if matrix is None or seen is None or base_revision > seen:
+            matrix = self._load(month=month)
+            if not matrix.dates:
+                raise FileNotFoundError(f"No log stored for {self.user} "
+                                        f"in {month}")
+            self.loads += 1
+        elif revision > seen:
+            for day, task, value in connect(self._path).execute(
+                    "SELECT day, task, value FROM log_values "
+                    "WHERE user = ? AND revision > ? AND day BETWEEN ? AND ?",
+                    (self.user, seen, f"{month}-00", f"{month}-99")):
+                matrix.set(date=to_date(day), column=task,
+                           value="None" if value is None else value)
+        self._months[month] = revision
+        return matrix
+
+    @timed("SQLiteBackend.record")
+    def record(self, date: str, entries: Entries) -> None:
+        month = month_key(date)
+        with self._transaction() as connection:
+            previous = self._user_row(columns="revision")[0]
+            revision = self._bump_revision(connection=connection)
+            position = connection.execute(
+                "SELECT COALESCE(MAX(position) + 1, 0) FROM log_tasks "
+                "WHERE user = ?", (self.user,)).fetchone()[0]
+            for column, _ in entries:
+                position += connection.execute(
+                    "INSERT OR IGNORE INTO log_tasks (user, task, position) "
+                    "VALUES (?, ?, ?)",
+                    (self.user, column, position)).rowcount
+            connection.executemany(
+                "INSERT INTO log_values (user, day, task, value, revision) "
+                "VALUES (?, ?, ?, ?, ?) ON CONFLICT (user, day, task) "
+                "DO UPDATE SET value = excluded.value, "
+                "revision = excluded.revision",
+                [(self.user, to_day(date), column,
+                  None if str(value) == "None" else int(float(value)),
+                  revision) for column, value in entries])
+            self._invalidate_checkpoints(connection=connection,
+                                         user=self.user, month=month)
+        if previous == self._months.get(month):
+            self._months[month] = revision
+
+    def _insert_log(self, connection: sqlite3.Connection,
+                    matrix: TaskMatrix, revision: int) -> None:
+        """Method for inserting the days and values of matrix inside a
+        transaction, its tasks not yet in the log are added after the others
+        """
+
+        rows, cols, values = matrix.entries()
+        days = [to_day(date) for date in matrix.dates]
+        position = connection.execute(
+            "SELECT COALESCE(MAX(position) + 1, 0) FROM log_tasks "
+            "WHERE user = ?", (self.user,)).fetchone()[0]
+        for column in matrix.columns:
+            position += connection.execute(
+                "INSERT OR IGNORE INTO log_tasks (user, task, position) "
+                "VALUES (?, ?, ?)", (self.user, column, position)).rowcount
+        connection.executemany(
+            "INSERT INTO log_days (user, day) VALUES (?, ?)",
+            [(self.user, day) for day in days])
+        connection.executemany(
+            "INSERT INTO log_values (user, day, task, value, revision) "
+            "VALUES (?, ?, ?, ?, ?)",
+            [(self.user, days[row], matrix.columns[col],
+              None if value == UNRECORDED else value, revision)
+             for row, col, value in zip(rows, cols, values)])
+
+    @timed("SQLiteBackend.write")
+    def write(self, matrix: TaskMatrix) -> None:
+        with self._transaction() as connection:
+            revision = self._bump_revision(connection=connection, rebase=True)
+            for table in ("log_days", "log_tasks", "log_values",
+                          "checkpoints", "task_stats", "stats_history"):
+                connection.execute(
+                    f"DELETE FROM {table} WHERE user = ?",  # nosec
+                    (self.user,))
+            self._insert_log(connection=connection, matrix=matrix,
+                             revision=revision)
+            self._insert_checkpoints(
+                connection=connection, user=self.user,
+                checkpoints=list(matrix_checkpoints(matrix=matrix).values()))
+        self._months = {}
+
+    @timed("SQLiteBackend.write_months")
+    def write_months(self, matrix: TaskMatrix) -> None:
+        self._revisions()
+        checkpoints = matrix_checkpoints(matrix=matrix)
+        with self._transaction() as connection:
+            revision = self._bump_revision(connection=connection, rebase=True)
+            for month in checkpoints:
+                for table in ("log_days", "log_values"):
+                    connection.execute(
+                        f"DELETE FROM {table} "  # nosec
+                        "WHERE user = ? AND day BETWEEN ? AND ?",
+                        (self.user, f"{month}-00", f"{month}-99"))
+            self._insert_log(connection=connection, matrix=matrix,
+                             revision=revision)
+            self._insert_checkpoints(connection=connection, user=self.user,
+                                     checkpoints=list(checkpoints.values()))
+            for month in checkpoints:
+                self._invalidate_checkpoints(connection=connection,
+                                             user=self.user, month=month)
+        self._months = {}
+
+    @timed("SQLiteBackend.delete_months")
+    def delete_months(self, months: List[str]) -> None:
+        self._revisions()
+        with self._transaction() as connection:
+            self._bump_revision(connection=connection, rebase=True)
+            for month in months:
+                for table in ("log_days", "log_values"):
+                    connection.execute(
+                        f"DELETE FROM {table} "  # nosec
+                        "WHERE user = ? AND day BETWEEN ? AND ?",
+                        (self.user, f"{month}-00", f"{month}-99"))
+                for table in ("checkpoints", "task_stats"):
+                    connection.execute(
+                        f"DELETE FROM {table} "  # nosec
+                        "WHERE user = ? AND month = ?", (self.user, month))
+                self._invalidate_checkpoints(connection=connection,
+                                             user=self.user, month=month)
+        self._months = {}
+
+    @timed("SQLiteBackend.extend")
+    def extend(self, matrix: TaskMatrix) -> None:
+        with self._transaction() as connection:
+            revision = self._bump_revision(connection=connection, rebase=True)
+            self._insert_log(connection=connection, matrix=matrix,
+                             revision=revision)
+            for month, start, stop in matrix.months():
+                min_day = connection.execute(
+                    "SELECT min_day FROM checkpoints "
+                    "WHERE user = ? AND month = ?",
+                    (self.user, month)).fetchone()
+                self._insert_checkpoints(
+                    connection=connection, user=self.user,
+                    checkpoints=[Checkpoint(
+                        month=month,
+                        min_date=to_date(min_day[0]) if min_day
+                        else matrix.dates[start],
+                        max_date=matrix.dates[stop - 1])])
+                self._invalidate_checkpoints(connection=connection,
+                                             user=self.user, month=month)
+        self._months = {}
+
+    @timed("SQLiteBackend.delete_log")
+    def delete_log(self) -> None:
+        with self._transaction() as connection:
+            self._bump_revision(connection=connection)
+            connection.execute(
+                "UPDATE users SET base_revision = 0 WHERE user = ?",
+                (self.user,))
+            for table in ("log_days", "log_tasks", "log_values",
+                          "checkpoints", "task_stats", "stats_history"):
+                connection.execute(
+                    f"DELETE FROM {table} WHERE user = ?",  # nosec
+                    (self.user,))
+        self._months = {}
+
+    @timed("SQLiteBackend.read_checkpoints")
+    def read_checkpoints(self) -> List[Checkpoint]:
+        self._revisions()
+        query = ("SELECT month, min_day, max_day, log_progress, last_delta, "
+                 "cumulative FROM checkpoints WHERE user = ? ORDER BY month")
+        rows = connect(self._path).execute(query, (self.user,)).fetchall()
+        if not rows:
+            with self._transaction() as connection:
+                connection.execute(
+                    "INSERT INTO checkpoints (user, month, min_day, max_day) "
+                    "SELECT user, substr(day, 1, 7), MIN(day), MAX(day) "
+                    "FROM log_days WHERE user = ? GROUP BY substr(day, 1, 7)",
+                    (self.user,))
+            rows = connect(self._path).execute(query, (self.user,)).fetchall()
+        return [Checkpoint(month, to_date(min_day), to_date(max_day), *rest)
+                for month, min_day, max_day, *rest in rows]
+
+    @timed("SQLiteBackend.write_checkpoints")
+    def write_checkpoints(self, checkpoints: List[Checkpoint]) -> None:
+        with self._transaction() as connection:
+            connection.executemany(
+                "UPDATE checkpoints SET log_progress = ?, last_delta = ?, "
+                "cumulative = ? WHERE user = ? AND month = ?",
+                [(*checkpoint[3:], self.user, checkpoint.month)
+                 for checkpoint in checkpoints])
+
+    @timed("SQLiteBackend.read_month_stats")
+    def read_month_stats(self, month: str) -> Dict[str, TaskStats]:
+        row = connect(self._path).execute(
+            "SELECT stats FROM task_stats WHERE user = ? AND month = ?",
+            (self.user, month)).fetchone()
+        if row is None:
+            raise FileNotFoundError(f"No task statistics stored for "
+                                    f"{self.user} in {month}")
+        return decode_stats(json.loads(row[0]))
+
+    @timed("SQLiteBackend.write_month_stats")
+    def write_month_stats(self,
+                          stats: Dict[str, Dict[str, TaskStats]]) -> None:
+        with self._transaction() as connection:
+            connection.executemany(
+                "INSERT OR REPLACE INTO task_stats (user, month, stats) "
+                "VALUES (?, ?, ?)",
+                [(self.user, month, json.dumps(encode_stats(month_stats)))
+                 for month, month_stats in stats.items()])
+
+    @timed("SQLiteBackend.read_stats_history")
+    def read_stats_history(self) -> Tuple[str, Dict[str, TaskStats]]:
+        row = connect(self._path).execute(
+            "SELECT through, stats FROM stats_history WHERE user = ?",
+            (self.user,)).fetchone()
+        if row is None:
+            raise FileNotFoundError(f"No task statistics stored for "
+                                    f"{self.user}")
+        return row[0], decode_stats(json.loads(row[1]))
+
+    @timed("SQLiteBackend.write_stats_history")
+    def write_stats_history(self, through: str,
+                            stats: Dict[str, TaskStats]) -> None:
+        with self._transaction() as connection:
+            connection.execute(
+                "INSERT OR REPLACE INTO stats_history (user, through, stats) "
+                "VALUES (?, ?, ?)",
+                (self.user, through, json.dumps(encode_stats(stats))))
+
+    @classmethod
+    def users(cls, path: str) -> List[str]:
+        """Method for getting every user stored in the database"""
+
+        return [user for user, in connect(path).execute(
+            "SELECT user FROM users ORDER BY user")]
+
+    def data_signature(self) -> str:
+        row = self._user_row(columns="revision, constant_revision")
+        return "" if row is None else f"{row[0]}:{row[1]}"
+
+    def constant_signature(self) -> Hashable:
+        row = self._user_row(columns="constant_revision, constant IS NULL")
+        if row is None or row[1]:
+            raise FileNotFoundError(f"No constant stored for {self.user}")
+        return row[0]
+
+    @timed("SQLiteBackend.read_constant")
+    def read_constant(self) -> str:
+        row = self._user_row(columns="constant")
+        if row is None or row[0] is None:
+            raise FileNotFoundError(f"No constant stored for {self.user}")
+        return row[0]
+
+    @timed("SQLiteBackend.write_constant")
+    def write_constant(self, data: bytes) -> None:
+        with self._transaction() as connection:
+            connection.execute(
+                "UPDATE users SET constant = ?, "
+                "constant_revision = constant_revision + 1 WHERE user = ?",
+                (data.decode("utf-8"), self.user))
+
+    @timed("SQLiteBackend.read_planned")
+    def read_planned(self) -> list:
+        row = self._user_row(columns="planned")
+        return [] if row is None else json.loads(row[0])
+
+    @timed("SQLiteBackend.write_planned")
+    def write_planned(self, tasks: list) -> None:
+        with self._transaction() as connection:
+            connection.execute("UPDATE users SET planned = ? WHERE user = ?",
+                               (json.dumps(tasks), self.user))
@@ -0,0 +1,516 @@
+"""Module for the storage backends behind Logs"""
+
+import csv
+import glob
+import io
+import json
+import os
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, Hashable, Iterator, List, Optional, Tuple
+
+import toml
+
+from filenames import (checkpoint_file, constant_file, current_user,
+                       lock_file, log_file, log_partition_file,
+                       month_stats_file, partition_journal_file, planned_file,
+                       stats_file)
+from instrumentation import Instrumentation, timed
+from log_store import LogStore
+from safe_files import FileLock, atomic_write, sync_directory
+from storage_backend import (Checkpoint, Entries, StorageBackend,
+                             invalidate_checkpoints, matrix_checkpoints)
+from task_matrix import TaskMatrix, month_key
+from task_stats import TaskStats, decode_stats, encode_stats
+
+
+def database_path() -> str:
+    """Returns the path of the SQLite database, from DAY_TRACKER_DB"""
+    return os.environ.get("DAY_TRACKER_DB", "day_tracker.db")
+
+
+def uses_sqlite() -> bool:
+    """Returns whether DAY_TRACKER_STORAGE chooses the SQLite backend"""
+    return os.environ.get("DAY_TRACKER_STORAGE", "file") == "sqlite"
+
+
+@contextmanager
+def user_lock(user: Optional[str] = None,
+              exclusive: bool = True) -> Iterator[None]:
+    """Context manager holding the read/write lock of a user, the current
+    user if none is given, exclusively to change their data and shared to
+    read it, so the sessions, background rollovers and bulk recordings of
+    every process never see or make a change halfway
+    """
+
+    path = lock_file(user or current_user())
+    if uses_sqlite():
+        path = os.path.join(os.path.dirname(os.path.abspath(
+            database_path())), path)
+    with FileLock.hold(path=path, exclusive=exclusive):
+        yield
+
+
+def _file_signature(path: str) -> Tuple[int, int, int]:
+    """Returns the (inode, mtime, size) signature of a file, files being
+    replaced by renaming a new file over them
+    """
+
+    stat = os.stat(path)
+    return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+
+def _optional_float(text: str) -> Optional[float]:
+    """Returns the float of a csv cell, None for an empty cell"""
+    return float(text) if text else None
+
+
+# one public method for each operation of the interface
+# pylint: disable=too-many-public-methods
+class FileBackend(StorageBackend):
+    """Storage backend keeping each user's data in files named after them,
+    the log is one binary log store per month listed in a checkpoints csv,
+    single values are appended to the journal of their month which is
+    folded over its store when read and compacted into it
+    """
+
+    JOURNAL_LIMIT = 100
+
+    def __init__(self, user: str):
+        """Constructor method for the class"""
+
+        super().__init__(user=user)
+        self._checkpoints: Dict[str, Checkpoint] = {}
+        self._checkpoint_signature: Optional[Tuple[int, int, int]] = None
+        self._months: Dict[str, Tuple[Tuple[int, int, int], int, int]] = {}
+
+    def _store(self, month: str) -> LogStore:
+        """Method for getting the log store of a month"""
+        return LogStore(path=log_partition_file(month, self.user))
+
+    def _journal_size(self, month: str) -> int:
+        """Method for getting the size of the journal of a month"""
+
+        try:
+            return os.stat(partition_journal_file(month, self.user)).st_size
+        except FileNotFoundError:
+            return 0
+
+    @classmethod
+    def _fold_journal(cls, path: str, matrix: TaskMatrix,
+                      offset: int = 0) -> Tuple[int, int]:
+        """Method for applying the journal entries after offset to matrix,
+        returning the offset of the end and the number of entries, a last
+        line cut short by a crash is left out
+        """
+
+        try:
+            with open(file=path, mode="rb") as file:
+                file.seek(offset)
+                data = file.read()
+        except FileNotFoundError:
+            return 0, 0
+        data = data[:data.rfind(b"\n") + 1]
+        entries = 0
+        for date, column, value, _ in csv.reader(
+                io.StringIO(data.decode("utf-8"), newline="")):
+            matrix.set(date=date, column=column, value=value)
+            entries += 1
+        Instrumentation.count_bytes(read=len(data))
+        return offset + len(data), entries
+
+    @classmethod
+    def _complete_journal(cls, file) -> int:
+        """Method for cutting a journal opened for appending back to its
+        last complete line, dropping a line a crash cut short, returning
+        the size left
+        """
+
+        size = file.seek(0, os.SEEK_END)
+        if not size:
+            return 0
+        file.seek(size - 1)
+        if file.read(1) == b"\n":
+            return size
+        file.seek(0)
+        data = file.read()
+        size = data.rfind(b"\n") + 1
+        file.truncate(size)
+        file.seek(size)
+        return size
+
+    def _remove_journal(self, month: str) -> None:
+        """Method for deleting the journal of a month"""
+
+        try:
+            os.remove(partition_journal_file(month, self.user))
+        except FileNotFoundError:
+            pass
+
+    def _read_month(self, month: str) -> TaskMatrix:
+        """Method for loading a month with its journal applied,
+        without touching what was last returned for it
+        """
+
+        matrix = self._store(month).load()
+        self._fold_journal(path=partition_journal_file(month, self.user),
+                           matrix=matrix)
+        return matrix
+
+    def _compact(self, month: str) -> None:
+        """Method for folding the journal of a month into its store"""
+
+        if self._journal_size(month) == 0:
+            return
+        store = self._store(month)
+        store.save(matrix=self._read_month(month))
+        self._remove_journal(month)
+        self._months.pop(month, None)
+
+    def _clear_stats(self) -> None:
+        """Method for deleting every stored task statistic"""
+
+        prefix = month_stats_file("", self.user)[:-len(".json")]
+        for path in [stats_file(self.user),
+                     *glob.glob(f"{glob.escape(prefix)}"
+                                "[0-9][0-9][0-9][0-9]-[0-9][0-9].json")]:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def _read_json(self, path: str):
+        """Method for reading a json file"""
+
+        with open(file=path, mode="r", encoding="utf-8") as file:
+            data = file.read()
+        Instrumentation.count_bytes(read=len(data))
+        return json.loads(data)
+
+    def _write_json(self, path: str, data) -> None:
+        """Method for replacing a json file"""
+
+        text = json.dumps(data).encode("utf-8")
+        atomic_write(path=path, data=text)
+        Instrumentation.count_bytes(written=len(text))
+
+    def _migrate(self) -> bool:
+        """Method for creating the checkpoints when there are none, from
+        the partitions if any are left, otherwise by splitting a log csv
+        """
+
+        prefix = log_partition_file("", self.user)[:-len(".bin")]
+        months = sorted(path[len(prefix):-len(".bin")] for path in glob.glob(
+            f"{glob.escape(prefix)}[0-9][0-9][0-9][0-9]-[0-9][0-9].bin"))
+        if months:
+            checkpoints = {}
+            for month in months:
+                dates = self._store(month).load().dates
+                checkpoints[month] = Checkpoint(month=month,
+                                                min_date=dates[0],
+                                                max_date=dates[-1])
+            self._save_checkpoints(checkpoints=checkpoints)
+            return True
+
+        path = log_file(self.user)
+        if not os.path.exists(path):
+            return False
+        self.write(matrix=TaskMatrix.from_csv(path_or_buffer=path))
+        os.replace(path, f"{path}.migrated")
+        sync_directory(directory=os.path.dirname(os.path.abspath(path)))
+        return True
+
+    def _load_checkpoints(self) -> Dict[str, Checkpoint]:
+        """Method for getting the checkpoints by month,
+        read again only when the file has changed
+        """
+
+        try:
+            signature = _file_signature(checkpoint_file(self.user))
+        except FileNotFoundError:
+            # readers hold the lock shared, only one of them may migrate
+            with user_lock(user=self.user):
+                if (not os.path.exists(checkpoint_file(self.user))
+                        and not self._migrate()):
+                    raise
+            signature = _file_signature(checkpoint_file(self.user))
+        if signature == self._checkpoint_signature:
+            return self._checkpoints
+
+        with open(file=checkpoint_file(self.user), mode="r",
+                  encoding="utf-8", newline="") as file:
+            reader = csv.reader(file)
+            next(reader, None)
+            self._checkpoints = {
+                row[0]: Checkpoint(*row[:3],
+                                   *(_optional_float(cell)
+                                     for cell in row[3:]))
+                for row in reader}
+            Instrumentation.count_bytes(read=file.tell())
+        self._checkpoint_signature = signature
+        return self._checkpoints
+
+    def _save_checkpoints(self, checkpoints: Dict[str, Checkpoint]) -> None:
+        """Method for replacing the checkpoints file"""
+
+        text = io.StringIO(newline="")
+        writer = csv.writer(text)
+        writer.writerow(Checkpoint._fields)
+        writer.writerows(["" if cell is None else cell for cell in checkpoint]
+                         for _, checkpoint in sorted(checkpoints.items()))
+        data = text.getvalue().encode("utf-8")
+        atomic_write(path=checkpoint_file(self.user), data=data)
+        Instrumentation.count_bytes(written=len(data))
+        self._checkpoints = checkpoints
+        self._checkpoint_signature = _file_signature(
+            checkpoint_file(self.user))
+
+    @timed("FileBackend.load_log")
+    def load_log(self) -> TaskMatrix:
+        return TaskMatrix.concat([self._read_month(month) for month
+                                  in sorted(self._load_checkpoints())])
+
+    @timed("FileBackend.sync_month")
+    def sync_month(self, month: str,
+                   matrix: Optional[TaskMatrix]) -> TaskMatrix:
+        if month not in self._load_checkpoints():
+            raise FileNotFoundError(f"No log stored for {self.user} "
+                                    f"in {month}")
+        signature = self._store(month).signature()
+        journal_size = self._journal_size(month)
+        state = self._months.get(month)
+        if (matrix is None or state is None or signature != state[0]
+                or journal_size < state[1]):
+            matrix = self._store(month).load()
+            state = (signature, 0, 0)
+            self.loads += 1
+        if journal_size > state[1]:
+            offset, entries = self._fold_journal(
+                path=partition_journal_file(month, self.user),
+                matrix=matrix, offset=state[1])
+            state = (signature, offset, state[2] + entries)
+        self._months[month] = state
+        return matrix
+
+    @timed("FileBackend.record")
+    def record(self, date: str, entries: Entries) -> None:
+        month = month_key(date)
+        # cleared first so a crash before the journal is synced leaves
+        # progress to work out again rather than progress that is wrong
+        checkpoints = dict(self._load_checkpoints())
+        if invalidate_checkpoints(checkpoints=checkpoints, month=month):
+            self._save_checkpoints(checkpoints=checkpoints)
+
+        timestamp = datetime.now().isoformat(timespec="seconds")
+        text = io.StringIO(newline="")
+        csv.writer(text).writerows(
+            [date, column, value, timestamp] for column, value in entries)
+        data = text.getvalue().encode("utf-8")
+        with open(file=partition_journal_file(month, self.user),
+                  mode="a+b") as file:
+            start = self._complete_journal(file=file)
+            file.write(data)
+            file.flush()
+            os.fsync(file.fileno())
+            end = file.tell()
+        if not start:
+            sync_directory(directory=os.path.dirname(os.path.abspath(
+                partition_journal_file(month, self.user))))
+        Instrumentation.count_bytes(written=end - start)
+
+        state = self._months.get(month)
+        if state is not None and state[1] == start:
+            self._months[month] = (state[0], end, state[2] + len(entries))
+            if state[2] + len(entries) >= self.JOURNAL_LIMIT:
+                self._compact(month)
+                self._months[month] = (self._store(month).signature(), 0, 0)
+
+    @timed("FileBackend.write")
+    def write(self, matrix: TaskMatrix) -> None:
+        previous = set(self._load_checkpoints()) \
+            if os.path.exists(checkpoint_file(self.user)) else set()
+        checkpoints = matrix_checkpoints(matrix=matrix)
+        for month, start, stop in matrix.months():
+            self._store(month).save(
+                matrix=matrix.select(start=start, stop=stop))
+            self._remove_journal(month)
+        self._clear_stats()
+        self._months = {}
+        # months are only dropped once the checkpoints no longer list them
+        self._save_checkpoints(checkpoints=checkpoints)
+        for month in previous - set(checkpoints):
+            self._store(month).delete()
+            self._remove_journal(month)
+
+    @timed("FileBackend.write_months")
+    def write_months(self, matrix: TaskMatrix) -> None:
+        checkpoints = dict(self._load_checkpoints())
+        for month, start, stop in matrix.months():
+            part = matrix.select(start=start, stop=stop)
+            self._store(month).save(matrix=part)
+            self._remove_journal(month)
+            self._months.pop(month, None)
+            checkpoints[month] = Checkpoint(month=month,
+                                            min_date=part.dates[0],
+                                            max_date=part.dates[-1])
+            invalidate_checkpoints(checkpoints=checkpoints, month=month)
+        self._save_checkpoints(checkpoints=checkpoints)
+
+    @timed("FileBackend.delete_months")
+    def delete_months(self, months: List[str]) -> None:
+        checkpoints = dict(self._load_checkpoints())
+        for month in months:
+            checkpoints.pop(month, None)
+            invalidate_checkpoints(checkpoints=checkpoints, month=month)
+        # months are only dropped once the checkpoints no longer list them
+        self._save_checkpoints(checkpoints=checkpoints)
+        for month in months:
+            self._store(month).delete()
+            self._remove_journal(month)
+            self._months.pop(month, None)
+            try:
+                os.remove(month_stats_file(month, self.user))
+            except FileNotFoundError:
+                pass
+
+    @timed("FileBackend.extend")
+    def extend(self, matrix: TaskMatrix) -> None:
+        stored = self._load_checkpoints()
+        parts = []
+        for month, start, stop in matrix.months():
+            added = matrix.select(start=start, stop=stop)
+            if month in stored:
+                added = TaskMatrix.concat([self._read_month(month), added])
+            parts.append(added)
+        self.write_months(matrix=TaskMatrix.concat(parts))
+
+    @timed("FileBackend.delete_log")
+    def delete_log(self) -> None:
+        try:
+            months = list(self._load_checkpoints())
+        except FileNotFoundError:
+            return
+        for month in months:
+            self._store(month).delete()
+            self._remove_journal(month)
+        os.remove(checkpoint_file(self.user))
+        self._clear_stats()
+        self._checkpoints, self._checkpoint_signature = {}, None
+        self._months = {}
+
+    @timed("FileBackend.read_checkpoints")
+    def read_checkpoints(self) -> List[Checkpoint]:
+        return [checkpoint for _, checkpoint
+                in sorted(self._load_checkpoints().items())]
+
+    @timed("FileBackend.write_checkpoints")
+    def write_checkpoints(self, checkpoints: List[Checkpoint]) -> None:
+        stored = dict(self._load_checkpoints())
+        stored.update((checkpoint.month, checkpoint)
+                      for checkpoint in checkpoints
+                      if checkpoint.month in stored)
+        self._save_checkpoints(checkpoints=stored)
+
+    @timed("FileBackend.read_month_stats")
+    def read_month_stats(self, month: str) -> Dict[str, TaskStats]:
+        return decode_stats(self._read_json(month_stats_file(month,
+                                                             self.user)))
+
+    @timed("FileBackend.write_month_stats")
+    def write_month_stats(self,
+                          stats: Dict[str, Dict[str, TaskStats]]) -> None:
+        for month, month_stats in stats.items():
+            self._write_json(path=month_stats_file(month, self.user),
+                             data=encode_stats(month_stats))
+
+    @timed("FileBackend.read_stats_history")
+    def read_stats_history(self) -> Tuple[str, Dict[str, TaskStats]]:
+        data = self._read_json(stats_file(self.user))
+        return data["through"], decode_stats(data["tasks"])
+
+    @timed("FileBackend.write_stats_history")
+    def write_stats_history(self, through: str,
+                            stats: Dict[str, TaskStats]) -> None:
+        self._write_json(path=stats_file(self.user),
+                         data={"through": through,
+                               "tasks": encode_stats(stats)})
+
+    @classmethod
+    def users(cls) -> List[str]:
+        """Method for getting every user with a constant file or a log in
+        the current directory
+        """
+
+        users = set()
+        for suffix in ("_constant.toml", "_checkpoints.csv", "_log.csv"):
+            users.update(path[:-len(suffix)]
+                         for path in glob.glob(f"*{glob.escape(suffix)}"))
+        return sorted(users)
+
+    def data_signature(self) -> str:
+        # derived files such as checkpoints and statistics are left out,
+        # reading the log can write them
+        paths = glob.glob(f"{glob.escape(self.user)}_log*")
+        signatures = []
+        for path in sorted([constant_file(self.user), *paths]):
+            try:
+                signatures.append([path, *_file_signature(path)])
+            except FileNotFoundError:
+                continue
+        return json.dumps(signatures)
+
+    def constant_signature(self) -> Hashable:
+        return _file_signature(constant_file(self.user))
+
+    @timed("FileBackend.read_constant")
+    def read_constant(self) -> str:
+        with open(file=constant_file(self.user), mode="r",
+                  encoding="utf-8") as file:
+            data = file.read()
+        Instrumentation.count_bytes(read=len(data))
+        return data
+
+    @timed("FileBackend.write_constant")
+    def write_constant(self, data: bytes) -> None:
+        atomic_write(path=constant_file(self.user), data=data)
+        Instrumentation.count_bytes(written=len(data))
+
+    @timed("FileBackend.read_planned")
+    def read_planned(self) -> list:
+        try:
+            return toml.load(planned_file(self.user))["tasks"]
+        except FileNotFoundError:
+            return []
+
+    @timed("FileBackend.write_planned")
+    def write_planned(self, tasks: list) -> None:
+        atomic_write(path=planned_file(self.user),
+                     data=toml.dumps({"tasks": tasks}).encode("utf-8"))
+
+
+def list_users() -> List[str]:
+    """Returns every user with stored data, in the storage chosen by the
+    DAY_TRACKER_STORAGE environment variable like get_backend
+    """
+
+    if uses_sqlite():
+        # imported here so file storage never loads sqlite
+        # pylint: disable=import-outside-toplevel
+        from sqlite_storage import SQLiteBackend
+        return SQLiteBackend.users(path=database_path())
+    return FileBackend.users()
+
+
+def get_backend(user: Optional[str] = None) -> StorageBackend:
+    """Returns the storage backend for a user, the current user if none
+    is given, chosen by the DAY_TRACKER_STORAGE environment variable
+    ("file" by default or "sqlite", using the DAY_TRACKER_DB database)
+    """
+
+    user = user or current_user()
+    if uses_sqlite():
+        # imported here so file storage never loads sqlite
+        # pylint: disable=import-outside-toplevel
+        from sqlite_storage import SQLiteBackend
+        return SQLiteBackend(user=user, path=database_path())
+    return FileBackend(user=user)
@@ -0,0 +1,175 @@
+"""Module for the interface of the storage backends and the checkpoints
+of the months of a log, shared by every backend
+"""
+
+from abc import ABC, abstractmethod
+from typing import Dict, Hashable, List, NamedTuple, Optional, Tuple, Union
+
+from task_matrix import TaskMatrix
+from task_stats import TaskStats
+
+Entries = List[Tuple[str, Union[str, int]]]
+
+
+class Checkpoint(NamedTuple):
+    """Checkpoint of a YYYY-mm month of the log, log_progress is the sum of
+    the log progress of its dates, last_delta the delta of its last date
+    and cumulative the log progress at its end, each None once the month
+    or an earlier one changed until they are worked out again
+    """
+
+    month: str
+    min_date: str
+    max_date: str
+    log_progress: Optional[float] = None
+    last_delta: Optional[float] = None
+    cumulative: Optional[float] = None
+
+
+def matrix_checkpoints(matrix: TaskMatrix) -> Dict[str, Checkpoint]:
+    """Returns the checkpoints of the months of a matrix by month,
+    without any progress worked out
+    """
+
+    return {month: Checkpoint(month=month, min_date=matrix.dates[start],
+                              max_date=matrix.dates[stop - 1])
+            for month, start, stop in matrix.months()}
+
+
+def invalidate_checkpoints(checkpoints: Dict[str, Checkpoint],
+                           month: str) -> bool:
+    """Clears the progress of a changed month and the cumulative progress
+    from it onwards, returning whether any checkpoint changed
+    """
+
+    changed = False
+    for key, checkpoint in checkpoints.items():
+        if key == month and checkpoint.log_progress is not None:
+            checkpoints[key] = checkpoint._replace(
+                log_progress=None, last_delta=None, cumulative=None)
+            changed = True
+        elif key >= month and checkpoint.cumulative is not None:
+            checkpoints[key] = checkpoint._replace(cumulative=None)
+            changed = True
+    return changed
+
+
+class StorageBackend(ABC):
+    """Interface for where a user's log, constant file and planned tasks
+    are kept, the log is kept as one partition per month next to a
+    checkpoint and the task statistics of each and an instance keeps track
+    of which version of a partition it last returned so it can return only
+    what changed
+    """
+
+    def __init__(self, user: str):
+        """Constructor method for the class"""
+
+        self.user = user
+        self.loads = 0
+
+    @abstractmethod
+    def load_log(self) -> TaskMatrix:
+        """Method for getting the whole stored log,
+        raises FileNotFoundError when the user has no log
+        """
+
+    @abstractmethod
+    def sync_month(self, month: str,
+                   matrix: Optional[TaskMatrix]) -> TaskMatrix:
+        """Method for getting the partition of a YYYY-mm month, reusing
+        matrix when it only needs the changes made since it was returned,
+        raises FileNotFoundError when the log has no such month
+        """
+
+    @abstractmethod
+    def record(self, date: str, entries: Entries) -> None:
+        """Method for storing (column, value) entries of a logged date"""
+
+    @abstractmethod
+    def write(self, matrix: TaskMatrix) -> None:
+        """Method for replacing the whole stored log"""
+
+    @abstractmethod
+    def write_months(self, matrix: TaskMatrix) -> None:
+        """Method for replacing the stored months that matrix holds,
+        keeping the other months
+        """
+
+    @abstractmethod
+    def delete_months(self, months: List[str]) -> None:
+        """Method for deleting stored YYYY-mm months with their checkpoints
+        and statistics, keeping the other months
+        """
+
+    @abstractmethod
+    def extend(self, matrix: TaskMatrix) -> None:
+        """Method for adding dates after the latest stored date"""
+
+    @abstractmethod
+    def delete_log(self) -> None:
+        """Method for deleting the stored log"""
+
+    @abstractmethod
+    def read_checkpoints(self) -> List[Checkpoint]:
+        """Method for getting the checkpoint of every month in order,
+        raises FileNotFoundError when the user has no log
+        """
+
+    @abstractmethod
+    def write_checkpoints(self, checkpoints: List[Checkpoint]) -> None:
+        """Method for storing checkpoints with their progress worked out"""
+
+    @abstractmethod
+    def read_month_stats(self, month: str) -> Dict[str, TaskStats]:
+        """Method for getting the task statistics of a YYYY-mm month,
+        raises FileNotFoundError when none are stored for it
+        """
+
+    @abstractmethod
+    def write_month_stats(self,
+                          stats: Dict[str, Dict[str, TaskStats]]) -> None:
+        """Method for storing the task statistics of months by month"""
+
+    @abstractmethod
+    def read_stats_history(self) -> Tuple[str, Dict[str, TaskStats]]:
+        """Method for getting the latest month folded into the task
+        statistics history, "" if none is, and the history itself,
+        raises FileNotFoundError when none is stored
+        """
+
+    @abstractmethod
+    def write_stats_history(self, through: str,
+                            stats: Dict[str, TaskStats]) -> None:
+        """Method for storing the task statistics of every month up to
+        and including through
+        """
+
+    @abstractmethod
+    def data_signature(self) -> str:
+        """Method for getting a text that changes whenever the log or the
+        constant file changes, the same across processes so it can be
+        stored to tell whether a user's data changed since
+        """
+
+    @abstractmethod
+    def constant_signature(self) -> Hashable:
+        """Method for getting a value that changes with the constant file,
+        raises FileNotFoundError when the user has none
+        """
+
+    @abstractmethod
+    def read_constant(self) -> str:
+        """Method for getting the toml text of the constant file"""
+
+    @abstractmethod
+    def write_constant(self, data: bytes) -> None:
+        """Method for replacing the constant file"""
+
+    @abstractmethod
+    def read_planned(self) -> list:
+        """Method for getting the planned tasks"""
+
+    @abstractmethod
+    def write_planned(self, tasks: list) -> None:
+        """Method for replacing the planned tasks"""
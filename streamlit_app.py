@@ -2,19 +2,31 @@
 
 import streamlit as st
 
-from filenames import log_file
+from instrumentation import Instrumentation
 from ui_components import UiComponents
+from utilities import Logs
 
 st.set_page_config(page_title="Day Tracker", page_icon="🗓️", layout="centered")
+Instrumentation.start_run()
 try:
     UiComponents.display()
 
 # unsure of error, need to always have log
 except Exception as e:  # pylint:disable=broad-except
     st.write(e)
-    with open(file=log_file(), mode="r", encoding="utf-8") as file:
-        st.download_button(label="Download Log",
-                           data=file.read(),
-                           file_name="day_tracker_log.csv",
-                           mime="text/csv",
-                           key="downloader")
+    if st.button(label="Prepare Log Download", key="crash_export_prepare"):
+        # best effort, whatever can still be read is offered
+        try:
+            data, skipped = Logs.recover_csv()
+        except Exception as error:  # pylint:disable=broad-except
+            st.write(f"The log could not be read: {error}")
+        else:
+            if skipped:
+                st.warning(f"Left out unreadable months: {', '.join(skipped)}")
+            st.download_button(label="Download Log",
+                               data=data,
+                               file_name="day_tracker_log.csv",
+                               mime="text/csv",
+                               key="crash_downloader")
+finally:
+    Instrumentation.finish_run()
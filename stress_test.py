@@ -0,0 +1,413 @@
+"""Script for stress testing concurrent writes to one user's log
+
+Starts writer processes that each run writer threads against the same
+user's log, recording single tasks the way a session does and through
+Logs.record_batch, while reader threads in this process read the log and
+its statistics. Every writer owns its own cells of the log, notes each
+write it is about to make and each one that returned in an
+acknowledgement file and reads every cell back once written. Afterwards
+the stored log must hold the latest acknowledged value of every cell,
+its checkpoints the progress of their months and its statistics those of
+the log, so no update may be lost:
+    python stress_test.py --processes 4 --threads 4 --writes 100
+--kill kills one writer process partway through to check that a crash
+leaves every file readable, a write it had begun may or may not be kept.
+"""
+
+import argparse
+import csv
+import glob
+import json
+import math
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Dict, List, Set, TextIO, Tuple
+
+import toml
+
+import benchmark
+
+USER = benchmark.USER
+VALUES = ("1", "0", "-1")
+Cell = Tuple[str, str]
+
+
+def ack_file(worker: int) -> str:
+    """Returns the filename of the acknowledgements of a writer"""
+    return f"stress_acks_{worker}.csv"
+
+
+def summary_file(process: int) -> str:
+    """Returns the filename of the summary of a writer process"""
+    return f"stress_summary_{process}.json"
+
+
+def write_cell(snapshot, acks: TextIO, cell: Cell, value: str,
+               batch: bool) -> bool:
+    """Writes a value to a cell through a session-like snapshot or a
+    one-record batch, noting the write in acks before it is made and once
+    it returned, returning whether the cell then reads back another value
+    """
+
+    # imported after the stub is installed
+    # pylint: disable=import-outside-toplevel
+    from storage import user_lock
+    from task_matrix import month_key
+    from utilities import Logs
+
+    date, column = cell
+    writer = csv.writer(acks)
+    writer.writerow(["intent", date, column, value])
+    acks.flush()
+    if batch:
+        section, task = column.split("-", 1)
+        report = Logs.record_batch(
+            user=USER, records=[(date, section, task, value)])
+        if report.recorded != 1:
+            raise RuntimeError(f"{date} {column} was rejected")
+    else:
+        with user_lock(user=USER):
+            snapshot.append(date=date, entries=[(column, value)])
+    writer.writerow(["done", date, column, value])
+    acks.flush()
+
+    with user_lock(user=USER, exclusive=False):
+        stored = snapshot.month(month=month_key(date)).value(
+            date=date, column=column)
+    return str(stored) != value
+
+
+def run_writer(worker: int, cells: List[Cell], writes: int,
+               batch_share: float, seed: int) -> Dict[str, int]:
+    """Writes random values to a writer's own cells, each through a
+    session-like snapshot or a one-record batch, reading every cell back
+    once written, returning the counts of writes and stale reads
+    """
+
+    # imported after the stub is installed
+    # pylint: disable=import-outside-toplevel
+    from storage import get_backend
+    from utilities import LogSnapshot
+
+    rng = random.Random(seed)
+    snapshot = LogSnapshot(backend=get_backend(user=USER))
+    counts = {"record": 0, "batch": 0, "stale_reads": 0}
+    with open(file=ack_file(worker), mode="a", encoding="utf-8",
+              newline="") as acks:
+        for _ in range(writes):
+            cell = rng.choice(cells)
+            value = rng.choice(VALUES)
+            batch = rng.random() < batch_share
+            counts["stale_reads"] += write_cell(
+                snapshot=snapshot, acks=acks, cell=cell, value=value,
+                batch=batch)
+            counts["batch" if batch else "record"] += 1
+    return counts
+
+
+def run_process(directory: str, process: int,
+                cells: Dict[int, List[Cell]], args) -> None:
+    """Runs the writer threads of a writer process over their cells,
+    writing the summary of the process when they are done
+    """
+
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    benchmark.install_streamlit_stub()
+    os.chdir(directory)
+    # imported after the stub is installed
+    # pylint: disable=import-outside-toplevel
+    from storage import FileBackend
+
+    FileBackend.JOURNAL_LIMIT = args.journal_limit
+    totals: Dict[str, int] = defaultdict(int)
+    errors = []
+    with ThreadPoolExecutor(max_workers=len(cells)) as executor:
+        jobs = [executor.submit(run_writer, worker=worker,
+                                cells=worker_cells, writes=args.writes,
+                                batch_share=args.batch_share,
+                                seed=args.seed * 1000 + worker)
+                for worker, worker_cells in cells.items()]
+        for job in jobs:
+            try:
+                for name, count in job.result().items():
+                    totals[name] += count
+            except Exception as error:  # pylint:disable=broad-except
+                errors.append(repr(error))
+    with open(file=summary_file(process), mode="w",
+              encoding="utf-8") as file:
+        json.dump({"counts": totals, "errors": errors}, file)
+
+
+def run_readers(readers: int, stop: threading.Event) -> Dict[str, int]:
+    """Reads the log and its statistics from reader threads until stop is
+    set, returning the counts of reads and errors
+    """
+
+    # imported after the stub is installed
+    # pylint: disable=import-outside-toplevel
+    from storage import get_backend, user_lock
+    from utilities import LogSnapshot
+
+    counts = {"reads": 0, "read_errors": 0}
+    guard = threading.Lock()
+
+    def read() -> None:
+        snapshot = LogSnapshot(backend=get_backend(user=USER))
+        while not stop.is_set():
+            try:
+                with user_lock(user=USER, exclusive=False):
+                    latest = snapshot.checkpoints()[-1].month
+                    snapshot.month(month=latest).deltas()
+                    snapshot.stats()
+                result = "reads"
+            except Exception:  # pylint:disable=broad-except
+                result = "read_errors"
+            with guard:
+                counts[result] += 1
+
+    threads = [threading.Thread(target=read, daemon=True)
+               for _ in range(readers)]
+    for thread in threads:
+        thread.start()
+    stop.wait()
+    for thread in threads:
+        thread.join()
+    return counts
+
+
+def read_acks(workers: int,
+              initial: Dict[Cell, str]) -> Dict[Cell, Tuple[str, Set[str]]]:
+    """Returns the latest acknowledged value of every written cell, its
+    initial value if no write to it returned, with the values of writes
+    begun after it
+    """
+
+    cells: Dict[Cell, Tuple[str, Set[str]]] = {}
+    for worker in range(workers):
+        try:
+            with open(file=ack_file(worker), mode="r", encoding="utf-8",
+                      newline="") as file:
+                rows = list(csv.reader(file))
+        except FileNotFoundError:
+            continue
+        for row in rows:
+            # a killed writer can leave its last line cut short
+            if len(row) != 4:
+                continue
+            kind, date, column, value = row
+            acknowledged, begun = cells.get(
+                (date, column), (initial[(date, column)], set()))
+            cells[(date, column)] = (value, set()) if kind == "done" \
+                else (acknowledged, begun | {value})
+    return cells
+
+
+def lost_updates(matrix, workers: int, initial: Dict[Cell, str]) -> int:
+    """Returns the count of cells of the log holding neither their latest
+    acknowledged value nor that of a write begun after it
+    """
+
+    lost = 0
+    for (date, column), (acknowledged, begun) in read_acks(
+            workers=workers, initial=initial).items():
+        stored = str(matrix.value(date=date, column=column))
+        lost += stored not in begun | {acknowledged}
+    return lost
+
+
+def wrong_checkpoints(backend) -> int:
+    """Returns the count of checkpoints whose progress does not match
+    their month
+    """
+
+    wrong = 0
+    for checkpoint in backend.read_checkpoints():
+        if checkpoint.log_progress is None:
+            continue
+        deltas = backend.sync_month(month=checkpoint.month,
+                                    matrix=None).deltas()
+        wrong += not math.isclose(
+            checkpoint.log_progress, sum(map(math.log1p, deltas)),
+            abs_tol=1e-9)
+    return wrong
+
+
+def wrong_stats(backend, matrix) -> int:
+    """Returns the count of tasks whose stored statistics do not match
+    those of the log
+    """
+
+    # imported after the stub is installed
+    # pylint: disable=import-outside-toplevel
+    from task_stats import fold_stats, log_stats
+    from utilities import LogSnapshot
+
+    by_month = log_stats(matrix=matrix)
+    expected = fold_stats(by_month[month] for month in sorted(by_month))
+    stored_stats = LogSnapshot(backend=backend).stats()
+    return sum(stored_stats.get(task) != stats
+               for task, stats in expected.items())
+
+
+def check_log(workers: int, initial: Dict[Cell, str]) -> Dict[str, int]:
+    """Returns the counts of lost updates, checkpoints whose progress does
+    not match their month and tasks whose statistics do not match the log
+    """
+
+    # imported after the stub is installed
+    # pylint: disable=import-outside-toplevel
+    from storage import get_backend
+
+    backend = get_backend(user=USER)
+    matrix = backend.load_log()
+    return {"lost_updates": lost_updates(matrix=matrix, workers=workers,
+                                         initial=initial),
+            "wrong_checkpoints": wrong_checkpoints(backend=backend),
+            "wrong_stats": wrong_stats(backend=backend, matrix=matrix),
+            "dates": len(matrix.dates)}
+
+
+def prepare_log(args) -> Dict[Cell, str]:
+    """Creates the user's constant file and a log up to today in the
+    current directory, returning the cells of the daily tasks with their
+    initial values
+    """
+
+    # imported after the stub is installed
+    # pylint: disable=import-outside-toplevel
+    from storage import get_backend
+    from utilities import Logs
+
+    constant = benchmark.generate_constant(tasks=args.tasks)
+    benchmark.generate_log(path="stress_log.csv", constant=constant,
+                           days=args.days, churn=0, seed=args.seed)
+    Logs.set_constant(data=toml.dumps(constant).encode("utf-8"))
+    Logs.replace_log(path_or_buffer="stress_log.csv")
+    Logs.config(date=datetime.now().strftime("%d/%m/%Y"))
+    matrix = get_backend(user=USER).load_log()
+    return {(date, column): str(value) for date in matrix.dates
+            for column, value in matrix.row_values(date=date).items()
+            if column.startswith(("morning-", "evening-"))}
+
+
+def run_stress(directory: str, initial: Dict[Cell, str],
+               args) -> Tuple[Dict[str, int], float]:
+    """Runs the writer processes over the cells of initial while reader
+    threads read the log, returning the counts of the readers and the
+    seconds the writers took
+    """
+
+    cells = sorted(initial)
+    random.Random(args.seed).shuffle(cells)
+    workers = args.processes * args.threads
+    context = multiprocessing.get_context("spawn")
+    processes = [context.Process(target=run_process, args=(
+        directory, process,
+        {worker: cells[worker::workers] for worker in range(
+            process * args.threads, (process + 1) * args.threads)},
+        args)) for process in range(args.processes)]
+    stop = threading.Event()
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        readers = executor.submit(run_readers, readers=args.readers,
+                                  stop=stop)
+        start_time = time.perf_counter()
+        for process in processes:
+            process.start()
+        if args.kill:
+            time.sleep(random.Random(args.seed).uniform(0.5, 2.0))
+            processes[0].kill()
+        for process in processes:
+            process.join()
+        seconds = time.perf_counter() - start_time
+        stop.set()
+        return defaultdict(int, readers.result()), seconds
+
+
+def read_summaries(processes: int, counts: Dict[str, int]) -> List[str]:
+    """Adds the counts of the writer processes to counts, a process that
+    left no summary counted as killed, returning their errors
+    """
+
+    errors = []
+    for process in range(processes):
+        try:
+            with open(file=summary_file(process), mode="r",
+                      encoding="utf-8") as file:
+                summary = json.load(file)
+        except FileNotFoundError:
+            counts["killed_processes"] += 1
+            continue
+        for name, count in summary["counts"].items():
+            counts[name] += count
+        errors.extend(summary["errors"])
+    return errors
+
+
+def main() -> None:
+    """Parses the arguments, runs the writers and readers against one log
+    and checks it, exiting with 1 if an update was lost
+    """
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--processes", type=int, default=4,
+                        help="writer processes")
+    parser.add_argument("--threads", type=int, default=4,
+                        help="writer threads in each writer process")
+    parser.add_argument("--writes", type=int, default=100,
+                        help="writes made by each writer thread")
+    parser.add_argument("--readers", type=int, default=2,
+                        help="reader threads in this process")
+    parser.add_argument("--batch-share", type=float, default=0.3,
+                        help="share of writes made with Logs.record_batch")
+    parser.add_argument("--journal-limit", type=int, default=20,
+                        help="journal entries before a month is compacted")
+    parser.add_argument("--days", type=int, default=90,
+                        help="days in the log written to")
+    parser.add_argument("--tasks", type=int, default=5,
+                        help="tasks in each section of the constant file")
+    parser.add_argument("--kill", action="store_true",
+                        help="kill one writer process partway through")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--directory",
+                        help="directory the log is kept in, a temporary "
+                        "one by default")
+    args = parser.parse_args()
+
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    benchmark.install_streamlit_stub()
+    workers = args.processes * args.threads
+    with tempfile.TemporaryDirectory() as temporary:
+        directory = os.path.abspath(args.directory or temporary)
+        os.makedirs(directory, exist_ok=True)
+        os.chdir(directory)
+        initial = prepare_log(args=args)
+        counts, seconds = run_stress(directory=directory, initial=initial,
+                                     args=args)
+        errors = read_summaries(processes=args.processes, counts=counts)
+        counts.update(check_log(workers=workers, initial=initial))
+        counts["temporary_files"] = len(glob.glob(".*.tmp"))
+        os.chdir(os.path.dirname(os.path.abspath(__file__)))
+
+    writes = counts["record"] + counts["batch"]
+    print(f"{writes} writes from {workers} writers in {seconds:.2f} s "
+          f"({writes / seconds:.0f} writes/s), {counts['reads']} reads")
+    for name, count in sorted(counts.items()):
+        print(f"  {name:<18}{count}")
+    for error in errors:
+        print(f"  error: {error}")
+    failed = (errors or counts["lost_updates"] or counts["read_errors"]
+              or counts["wrong_checkpoints"] or counts["stale_reads"]
+              or (counts["wrong_stats"] and not args.kill))
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
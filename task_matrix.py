@@ -0,0 +1,364 @@
+"""Module for the numeric task matrix the log is loaded into"""
+
+from array import array
+from bisect import bisect_left
+from itertools import accumulate
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+
+from instrumentation import timed
+
+UNRECORDED = 127
+UNSCHEDULED = -128
+
+# numpy dtypes matching the typecodes of the matrix arrays
+DTYPES = {"q": "int64", "i": "int32", "b": "int8"}
+
+
+def sort_key(date: str) -> str:
+    """Returns a dd/mm/YYYY log date as a sortable YYYYmmdd string"""
+    return date[6:] + date[3:5] + date[:2]
+
+
+def month_key(date: str) -> str:
+    """Returns the YYYY-mm month of a dd/mm/YYYY log date"""
+    return f"{date[6:]}-{date[3:5]}"
+
+
+def typed_array(typecode: str, values: Sequence[int]) -> array:
+    """Returns values as an array of typecode, copied as raw bytes when
+    they are a numpy array
+    """
+
+    if isinstance(values, array) and values.typecode == typecode:
+        return values
+    if hasattr(values, "dtype"):
+        converted = array(typecode)
+        converted.frombytes(values.astype(DTYPES[typecode]).tobytes())
+        return converted
+    return array(typecode, values)
+
+
+# the entry arrays, their lookups and the cached reductions
+# pylint: disable=too-many-instance-attributes
+class TaskMatrix:
+    """Class holding the log as sparse (date, task, value) entries, only
+    scheduled tasks are stored: the entries of the date at row i are
+    col_ids[indptr[i]:indptr[i + 1]], in column order, with their values
+    held at the same positions of values, -1, 0 or 1 once recorded and
+    UNRECORDED for a scheduled task without a value yet
+
+    The entries are kept in standard library arrays so showing and
+    recording a day never imports numpy or pandas, only the conversions
+    to and from dense cells and dataframes do.
+    """
+
+    def __init__(self, dates: List[str], columns: List[str],
+                 indptr: Sequence[int], col_ids: Sequence[int],
+                 values: Sequence[int]):
+        """Constructor method for the class"""
+
+        self.dates = dates
+        self.columns = columns
+        self.indptr = typed_array(typecode="q", values=indptr)
+        self.col_ids = typed_array(typecode="i", values=col_ids)
+        self.values = typed_array(typecode="b", values=values)
+        self._date_positions = {date: i for i, date in enumerate(dates)}
+        self._column_positions = {column: i for i, column
+                                  in enumerate(columns)}
+        self._scores: Optional[List[int]] = None
+        self._totals: Optional[List[int]] = None
+
+    @classmethod
+    def from_entries(cls, dates: List[str], columns: List[str],
+                     rows: Sequence[int], cols: Sequence[int],
+                     values: Sequence[int]) -> "TaskMatrix":
+        """Method for creating a matrix from (row, column, value) entries
+        in any order, the last of duplicated entries is kept
+        """
+
+        width = len(columns)
+        cells = {row * width + col: value
+                 for row, col, value in zip(rows, cols, values)}
+        keys = sorted(cells)
+        counts = [0] * len(dates)
+        for key in keys:
+            counts[key // width] += 1
+        return cls(dates=dates, columns=columns,
+                   indptr=list(accumulate(counts, initial=0)),
+                   col_ids=[key % width for key in keys],
+                   values=[cells[key] for key in keys])
+
+    @classmethod
+    def from_dense(cls, dates: List[str], columns: List[str],
+                   cells) -> "TaskMatrix":
+        """Method for creating a matrix from a dates by columns int8 numpy
+        array where UNSCHEDULED marks a task not on that day
+        """
+
+        # pylint: disable=import-outside-toplevel
+        import numpy as np
+
+        rows, cols = np.nonzero(cells != UNSCHEDULED)
+        return cls(dates=dates, columns=columns,
+                   indptr=np.concatenate([[0], np.cumsum(np.bincount(
+                       rows, minlength=len(dates)))]),
+                   col_ids=cols, values=cells[rows, cols])
+
+    @classmethod
+    def from_dataframe(cls, dataframe) -> "TaskMatrix":
+        """Method for creating a matrix from a wide log dataframe,
+        where "None" marks an unrecorded task and an empty cell
+        an unscheduled one
+        """
+
+        # pylint: disable=import-outside-toplevel
+        import numpy as np
+        import pandas as pd
+
+        values = dataframe.to_numpy(dtype=object)
+        unscheduled = pd.isna(values) | (values == "")
+        unrecorded = values == "None"
+        recorded = ~(unscheduled | unrecorded)
+
+        cells = np.full(values.shape, UNSCHEDULED, dtype=np.int8)
+        cells[unrecorded] = UNRECORDED
+        cells[recorded] = values[recorded].astype(float).astype(np.int8)
+        return cls.from_dense(dates=[str(date) for date in dataframe.index],
+                              columns=list(dataframe.columns), cells=cells)
+
+    @classmethod
+    @timed("TaskMatrix.from_csv")
+    def from_csv(cls, path_or_buffer) -> "TaskMatrix":
+        """Method for creating a matrix from a wide log csv"""
+
+        # pylint: disable=import-outside-toplevel
+        import pandas as pd
+
+        return cls.from_dataframe(pd.read_csv(
+            filepath_or_buffer=path_or_buffer, index_col="date", dtype=str,
+            keep_default_na=False))
+
+    @classmethod
+    def from_schedule(cls, dates: List[str],
+                      day_columns: List[List[str]]) -> "TaskMatrix":
+        """Method for creating a matrix of unrecorded tasks from the
+        columns scheduled on each date
+        """
+
+        columns = list(dict.fromkeys(
+            column for day in day_columns for column in day))
+        positions = {column: i for i, column in enumerate(columns)}
+        rows = [row for row, day in enumerate(day_columns) for _ in day]
+        cols = [positions[column] for day in day_columns for column in day]
+        return cls.from_entries(dates=dates, columns=columns, rows=rows,
+                                cols=cols, values=[UNRECORDED] * len(cols))
+
+    @classmethod
+    def concat(cls, matrices: List["TaskMatrix"]) -> "TaskMatrix":
+        """Method for stacking matrices by date,
+        joining their columns in order of first appearance
+        """
+
+        columns = list(dict.fromkeys(
+            column for matrix in matrices for column in matrix.columns))
+        positions = {column: i for i, column in enumerate(columns)}
+        mappings = [[positions[column] for column in matrix.columns]
+                    for matrix in matrices]
+        if all(mapping == sorted(mapping) for mapping in mappings):
+            return cls._stack(matrices=matrices, columns=columns,
+                              mappings=mappings)
+
+        rows: List[int] = []
+        cols: List[int] = []
+        entry_values: List[int] = []
+        offset = 0
+        for matrix, mapping in zip(matrices, mappings):
+            matrix_rows, matrix_cols, matrix_values = matrix.entries()
+            rows.extend(offset + row for row in matrix_rows)
+            cols.extend(mapping[col] for col in matrix_cols)
+            entry_values.extend(matrix_values)
+            offset += len(matrix.dates)
+        return cls.from_entries(
+            dates=[date for matrix in matrices for date in matrix.dates],
+            columns=columns, rows=rows, cols=cols, values=entry_values)
+
+    @classmethod
+    def _stack(cls, matrices: List["TaskMatrix"], columns: List[str],
+               mappings: List[List[int]]) -> "TaskMatrix":
+        """Method for stacking matrices whose column ids map to columns in
+        the same order, so every row stays sorted without sorting
+        """
+
+        indptr, col_ids = array("q", [0]), array("i")
+        values = array("b")
+        for matrix, mapping in zip(matrices, mappings):
+            offset = indptr[-1]
+            indptr.extend(offset + position for position in matrix.indptr[1:])
+            col_ids.extend(mapping[col] for col in matrix.col_ids)
+            values.extend(matrix.values)
+        return cls(
+            dates=[date for matrix in matrices for date in matrix.dates],
+            columns=columns, indptr=indptr, col_ids=col_ids, values=values)
+
+    def entries(self, start: int = 0, stop: Optional[int] = None
+                ) -> Tuple[List[int], List[int], List[int]]:
+        """Method for getting the (row, column id, value) entries
+        of rows start to stop
+        """
+
+        stop = len(self.dates) if stop is None else stop
+        indptr = self.indptr
+        first, last = indptr[start], indptr[stop]
+        return ([row for row in range(start, stop)
+                 for _ in range(indptr[row + 1] - indptr[row])],
+                self.col_ids[first:last].tolist(),
+                self.values[first:last].tolist())
+
+    def dense(self, start: int = 0, stop: Optional[int] = None):
+        """Method for getting rows start to stop as a dates by columns int8
+        numpy array where UNSCHEDULED marks a task not on that day
+        """
+
+        # pylint: disable=import-outside-toplevel
+        import numpy as np
+
+        stop = len(self.dates) if stop is None else stop
+        first, last = self.indptr[start], self.indptr[stop]
+        counts = np.diff(np.frombuffer(self.indptr, dtype=np.int64)
+                         [start:stop + 1])
+        cells = np.full((stop - start, len(self.columns)), UNSCHEDULED,
+                        dtype=np.int8)
+        cells[np.repeat(np.arange(stop - start), counts),
+              np.frombuffer(self.col_ids, dtype=np.int32)[first:last]] = \
+            np.frombuffer(self.values, dtype=np.int8)[first:last]
+        return cells
+
+    def select(self, start: int, stop: int) -> "TaskMatrix":
+        """Method for getting a matrix of rows start to stop,
+        keeping only the columns scheduled on them
+        """
+
+        first, last = self.indptr[start], self.indptr[stop]
+        cols = self.col_ids[first:last]
+        used = sorted(set(cols))
+        positions = {col: i for i, col in enumerate(used)}
+        return TaskMatrix(dates=self.dates[start:stop],
+                          columns=[self.columns[col] for col in used],
+                          indptr=[position - first for position
+                                  in self.indptr[start:stop + 1]],
+                          col_ids=[positions[col] for col in cols],
+                          values=self.values[first:last])
+
+    def months(self) -> List[Tuple[str, int, int]]:
+        """Method for getting the (month, start, stop) rows of every month"""
+
+        months = []
+        for row, date in enumerate(self.dates):
+            month = month_key(date)
+            if months and months[-1][0] == month:
+                months[-1][2] = row + 1
+            else:
+                months.append([month, row, row + 1])
+        return list(map(tuple, months))
+
+    def head(self, count: int) -> "TaskMatrix":
+        """Method for getting a matrix of the first count dates"""
+
+        count = min(count, len(self.dates))
+        end = self.indptr[count]
+        return TaskMatrix(dates=self.dates[:count], columns=self.columns,
+                          indptr=self.indptr[:count + 1],
+                          col_ids=self.col_ids[:end],
+                          values=self.values[:end])
+
+    def position(self, date: str) -> int:
+        """Method for getting the row of a date"""
+        return self._date_positions[date]
+
+    def row_values(self, date: str) -> Dict[str, Union[int, str]]:
+        """Method for getting every scheduled cell of a date as it appears
+        in the log, keyed by column
+        """
+
+        row = self._date_positions[date]
+        start, stop = self.indptr[row], self.indptr[row + 1]
+        return {self.columns[col]: "None" if value == UNRECORDED else value
+                for col, value in zip(self.col_ids[start:stop],
+                                      self.values[start:stop])}
+
+    def _find(self, date: str, column: str) -> Tuple[int, bool]:
+        """Method for finding where the entry of a cell is or would go,
+        and whether it is there
+        """
+
+        row = self._date_positions[date]
+        col = self._column_positions[column]
+        stop = self.indptr[row + 1]
+        index = bisect_left(self.col_ids, col, self.indptr[row], stop)
+        return index, index < stop and self.col_ids[index] == col
+
+    def value(self, date: str, column: str) -> Union[int, str, None]:
+        """Method for getting a cell as it appears in the log,
+        "None" if unrecorded and None if unscheduled
+        """
+
+        index, found = self._find(date=date, column=column)
+        if not found:
+            return None
+        value = self.values[index]
+        return "None" if value == UNRECORDED else value
+
+    def set(self, date: str, column: str, value: Union[int, str]) -> None:
+        """Method for setting a cell, values for dates not in the matrix
+        are ignored and columns not in it are added
+        """
+
+        if date not in self._date_positions:
+            return
+        if column not in self._column_positions:
+            self._column_positions[column] = len(self.columns)
+            self.columns = [*self.columns, column]
+        cell = UNRECORDED if str(value) == "None" else int(float(value))
+        index, found = self._find(date=date, column=column)
+        if found:
+            self.values[index] = cell
+        else:
+            self.col_ids.insert(index, self._column_positions[column])
+            self.values.insert(index, cell)
+            for row in range(self._date_positions[date] + 1,
+                             len(self.indptr)):
+                self.indptr[row] += 1
+        self._scores = self._totals = None
+
+    def _reduce(self) -> None:
+        """Method for computing the per date scores and totals"""
+
+        indptr, values = self.indptr, self.values
+        self._totals = [indptr[row + 1] - indptr[row]
+                        for row in range(len(self.dates))]
+        self._scores = [sum(value for value in values[indptr[row]:
+                                                      indptr[row + 1]]
+                            if value != UNRECORDED)
+                        for row in range(len(self.dates))]
+
+    def scores(self) -> List[int]:
+        """Method for getting the score of every date"""
+
+        if self._scores is None:
+            self._reduce()
+        return self._scores
+
+    def totals(self) -> List[int]:
+        """Method for getting the number of scheduled tasks of every date"""
+
+        if self._totals is None:
+            self._reduce()
+        return self._totals
+
+    def deltas(self) -> List[float]:
+        """Method for getting the progress delta of every date,
+        0.01 times the score over the number of scheduled tasks
+        """
+
+        return [0.01 * score / total if total else 0.0
+                for score, total in zip(self.scores(), self.totals())]
@@ -0,0 +1,253 @@
+"""Module for the per task statistics kept next to the log"""
+
+from datetime import datetime
+from typing import (Dict, Iterable, Iterator, List, NamedTuple, Optional,
+                    Tuple)
+
+from task_matrix import UNRECORDED, TaskMatrix
+
+WEEKDAYS = ("Monday", "Tuesday", "Wednesday", "Thursday", "Friday",
+            "Saturday", "Sunday")
+
+
+class TaskStats(NamedTuple):
+    """Statistics of a task over a run of dates, a streak counts the dates
+    it was actioned in a row, skipping the dates it was not recorded on
+
+    prefix and suffix are the streaks the run starts and ends with and
+    unbroken whether every recorded date was actioned, which is what lets
+    the statistics of consecutive runs be combined with then
+    """
+
+    actioned: int = 0
+    undoable: int = 0
+    avoided: int = 0
+    prefix: int = 0
+    suffix: int = 0
+    longest: int = 0
+    unbroken: bool = True
+    weekday_actioned: Tuple[int, ...] = (0,) * 7
+    weekday_recorded: Tuple[int, ...] = (0,) * 7
+
+    @property
+    def recorded(self) -> int:
+        """The number of dates the task was recorded on"""
+        return self.actioned + self.undoable + self.avoided
+
+    @property
+    def current_streak(self) -> int:
+        """The dates actioned in a row up to the latest recorded one"""
+        return self.suffix
+
+    @property
+    def success_rates(self) -> List[Optional[float]]:
+        """The share of the recorded dates of each weekday that were
+        actioned, None for a weekday never recorded
+        """
+
+        return [actioned / recorded if recorded else None
+                for actioned, recorded
+                in zip(self.weekday_actioned, self.weekday_recorded)]
+
+    def then(self, later: "TaskStats") -> "TaskStats":
+        """Method for combining with the statistics of the dates after"""
+
+        return TaskStats(
+            actioned=self.actioned + later.actioned,
+            undoable=self.undoable + later.undoable,
+            avoided=self.avoided + later.avoided,
+            prefix=self.prefix + later.prefix if self.unbroken
+            else self.prefix,
+            suffix=self.suffix + later.suffix if later.unbroken
+            else later.suffix,
+            longest=max(self.longest, later.longest,
+                        self.suffix + later.prefix),
+            unbroken=self.unbroken and later.unbroken,
+            weekday_actioned=tuple(
+                map(sum, zip(self.weekday_actioned, later.weekday_actioned))),
+            weekday_recorded=tuple(
+                map(sum, zip(self.weekday_recorded, later.weekday_recorded))))
+
+    def flat(self) -> List[int]:
+        """Method for getting the statistics as a flat list of integers"""
+
+        return [self.actioned, self.undoable, self.avoided, self.prefix,
+                self.suffix, self.longest, int(self.unbroken),
+                *self.weekday_actioned, *self.weekday_recorded]
+
+    @classmethod
+    def from_flat(cls, values: List[int]) -> "TaskStats":
+        """Method for creating the statistics from a flat list of integers"""
+
+        return cls(*values[:6], bool(values[6]), tuple(values[7:14]),
+                   tuple(values[14:21]))
+
+
+def fold_stats(parts: Iterable[Dict[str, TaskStats]]) -> Dict[str, TaskStats]:
+    """Returns the statistics of consecutive runs of dates combined,
+    a task missing from a run was not scheduled in it
+    """
+
+    folded: Dict[str, TaskStats] = {}
+    for part in parts:
+        for task, stats in part.items():
+            folded[task] = folded[task].then(stats) if task in folded \
+                else stats
+    return folded
+
+
+def encode_stats(stats: Dict[str, TaskStats]) -> Dict[str, List[int]]:
+    """Returns the statistics of every task as json serializable lists"""
+    return {task: task_stats.flat() for task, task_stats in stats.items()}
+
+
+def decode_stats(data: Dict[str, List[int]]) -> Dict[str, TaskStats]:
+    """Returns the statistics of every task from their encoded lists"""
+    return {task: TaskStats.from_flat(values)
+            for task, values in data.items()}
+
+
+def month_stats(matrix: TaskMatrix,
+                columns: Optional[List[str]] = None) -> Dict[str, TaskStats]:
+    """Returns the statistics of the tasks scheduled in a matrix, only of
+    columns if given, from one walk over its entries
+    """
+
+    wanted = set(range(len(matrix.columns))) if columns is None \
+        else {matrix.columns.index(column) for column in columns
+              if column in matrix.columns}
+    weekdays = [datetime.strptime(date, "%d/%m/%Y").weekday()
+                for date in matrix.dates]
+    # actioned, undoable, avoided, prefix, run, longest, unbroken
+    counts: Dict[int, list] = {}
+    weekday_counts: Dict[int, Tuple[list, list]] = {}
+    for row, col, value in zip(*matrix.entries()):
+        if col not in wanted:
+            continue
+        if col not in counts:
+            counts[col] = [0, 0, 0, 0, 0, 0, True]
+            weekday_counts[col] = ([0] * 7, [0] * 7)
+        if value == UNRECORDED:
+            continue
+        state = counts[col]
+        actioned, recorded = weekday_counts[col]
+        recorded[weekdays[row]] += 1
+        if value == 1:
+            actioned[weekdays[row]] += 1
+            state[0] += 1
+            state[3] += state[6]
+            state[4] += 1
+            state[5] = max(state[5], state[4])
+        else:
+            state[1 if value == 0 else 2] += 1
+            state[4] = 0
+            state[6] = False
+    return {matrix.columns[col]: TaskStats(
+        *state[:6], state[6], tuple(weekday_counts[col][0]),
+        tuple(weekday_counts[col][1])) for col, state in counts.items()}
+
+
+def _streaks(actioned, starts, sizes) -> tuple:
+    """Returns the streak ending on each entry of groups of entries in date
+    order and whether each entry is actioned before any break of its group
+    """
+
+    # pylint: disable=import-outside-toplevel
+    import numpy as np
+
+    # the streak ending on each entry counts the actioned entries since
+    # the latest break or start of its group
+    broken = ~actioned
+    ones = np.cumsum(actioned)
+    reset = broken.copy()
+    reset[starts] = True
+    latest = np.maximum.accumulate(
+        np.where(reset, np.arange(actioned.size), 0))
+    run = ones - np.where(broken, ones, ones - actioned)[latest]
+    breaks = np.cumsum(broken)
+    before = np.repeat((breaks - broken)[starts], sizes)
+    return run, actioned & (breaks == before)
+
+
+def _weekday_counts(actioned, weekdays, starts, sizes) -> tuple:
+    """Returns the actioned and recorded entries of each group of entries
+    by weekday, as a list of seven counts per group
+    """
+
+    # pylint: disable=import-outside-toplevel
+    import numpy as np
+
+    keys = np.repeat(np.arange(starts.size), sizes) * 7 + weekdays
+    return (np.bincount(keys, weights=actioned, minlength=starts.size * 7)
+            .astype(np.int64).reshape(-1, 7).tolist(),
+            np.bincount(keys, minlength=starts.size * 7)
+            .reshape(-1, 7).tolist())
+
+
+def _group_stats(groups, values, weekdays) -> Iterator[Tuple[int, TaskStats]]:
+    """Generates the (group, statistics) of every group of recorded entries,
+    the entries given sorted by group and then date
+    """
+
+    # pylint: disable=import-outside-toplevel
+    import numpy as np
+
+    starts = np.flatnonzero(np.r_[True, groups[1:] != groups[:-1]])
+    sizes = np.diff(np.r_[starts, groups.size])
+    actioned = values == 1
+    run, leading = _streaks(actioned=actioned, starts=starts, sizes=sizes)
+
+    def per_group(cells) -> list:
+        return np.add.reduceat(cells.astype(np.int64), starts).tolist()
+
+    for key, *fields, breaks_count, weekday, weekday_all in zip(
+            groups[starts].tolist(), per_group(actioned),
+            per_group(values == 0), per_group(values == -1),
+            per_group(leading), run[starts + sizes - 1].tolist(),
+            np.maximum.reduceat(run, starts).tolist(), per_group(~actioned),
+            *_weekday_counts(actioned=actioned, weekdays=weekdays,
+                             starts=starts, sizes=sizes)):
+        yield key, TaskStats(*fields, breaks_count == 0, tuple(weekday),
+                             tuple(weekday_all))
+
+
+def log_stats(matrix: TaskMatrix) -> Dict[str, Dict[str, TaskStats]]:
+    """Returns the statistics of the tasks scheduled in each month of a
+    matrix by month, worked out for the whole log in one vectorized pass
+    over its entries
+    """
+
+    # numpy is only needed to rebuild the statistics after an import
+    # pylint: disable=import-outside-toplevel
+    import numpy as np
+
+    months = matrix.months()
+    month_rows = np.repeat(np.arange(len(months)),
+                           [stop - start for _, start, stop in months])
+    rows = np.repeat(np.arange(len(matrix.dates)),
+                     np.diff(np.frombuffer(matrix.indptr, dtype=np.int64)))
+    cols = np.frombuffer(matrix.col_ids, dtype=np.int32).astype(np.int64)
+    values = np.frombuffer(matrix.values, dtype=np.int8)
+
+    # every task scheduled in a month has statistics, even when unrecorded
+    stats: Dict[str, Dict[str, TaskStats]] = {
+        month: {} for month, _, _ in months}
+    for key in np.unique(cols * len(months) + month_rows[rows]).tolist():
+        col, month = divmod(key, len(months))
+        stats[months[month][0]][matrix.columns[col]] = TaskStats()
+
+    # the recorded entries of each (task, month) group in date order
+    recorded = values != UNRECORDED
+    order = np.lexsort((rows[recorded], cols[recorded]))
+    rows, values = rows[recorded][order], values[recorded][order]
+    groups = cols[recorded][order] * len(months) + month_rows[rows]
+    if not groups.size:
+        return stats
+    for key, task_stats in _group_stats(
+            groups=groups, values=values,
+            weekdays=np.array([
+                datetime.strptime(date, "%d/%m/%Y").weekday()
+                for date in matrix.dates], dtype=np.int64)[rows]):
+        col, month = divmod(key, len(months))
+        stats[months[month][0]][matrix.columns[col]] = task_stats
+    return stats
@@ -2,29 +2,50 @@
 
 from datetime import datetime
 from typing import Tuple
-import numpy as np
-import pandas as pd
+import math
 import streamlit as st
-import toml
 
-from filenames import constant_file, log_file
-from utilities import Logs
+from constant_config import ConstantConfig
+from filenames import constant_file, current_user, log_file
+from instrumentation import Instrumentation, rerun
+from log_export import SECTIONS, ExportOptions
+from log_import import KEEP_EXISTING, NEWEST_WINS
+from rollover import Rollover
+from task_matrix import sort_key
+from task_stats import WEEKDAYS
+from utilities import Logs, LogSnapshot
 from objectives import BasicObjective, WriteObjective, PlanObjective
 
 
+DISPLAY_SECTIONS = ["morning", "general", "food", "planned", "evening"]
+SCORE_MARKER = "score-slider"
+# the innermost block holding the marker, the container of the score slider
+SCORE_BLOCK = (f'div[data-testid="stVerticalBlock"]:has(#{SCORE_MARKER})'
+               f':not(:has(div[data-testid="stVerticalBlock"] '
+               f'#{SCORE_MARKER}))')
+
+
 # pylint: disable=too-few-public-methods
 class UiComponents:
     """Class containing useful UI functions"""
 
+    @classmethod
+    def _value_as_string(cls, val: float) -> str:
+        """Method for returning a progress value as a string"""
+        return f"{round(val, 2)}x" if val > 10 else f"{round(val * 100, 2)}%"
+
+    @classmethod
+    def _task_label(cls, task: str) -> str:
+        """Method for labelling a task with its section"""
+
+        section, name = task.split("-", 1)
+        return f"{name} ({section})"
+
     @classmethod
     def _value_display(cls, current_progress: Tuple[float, float],
                        new_progress: Tuple[float, float]) -> None:
         """Method for displaying the UI for the values"""
 
-        def value_as_string(val: float) -> str:
-            """Function for returning a value as a string"""
-            return f"{round(val, 2)}x" if val > 10 else f"{round(val * 100, 2)}%"
-
         def delta_as_string(val: float) -> str:
             """Function for returning a value as a string"""
             return f"{round(val * 100, 2)}%"
@@ -35,23 +56,29 @@ class UiComponents:
         current_col, new_col = st.columns(2)
         with current_col:
             st.metric(label="Start Value",
-                      value=value_as_string(current_value),
+                      value=cls._value_as_string(current_value),
                       delta=delta_as_string(current_delta))
         with new_col:
             st.metric(label="EOD Value",
-                      value=value_as_string(new_value),
+                      value=cls._value_as_string(new_value),
                       delta=delta_as_string(new_delta))
 
     @classmethod
     def _color_config(cls, current_score: int, total_score: int) -> None:
-        """Method for setting the primary color of the theme"""
+        """Method for colouring the score in this session, styled at render
+        time so no config file is written and no rerun is needed
+
+        Only the score slider takes the colour. The theme's primary colour,
+        which the config file used to set for every session, stays at its
+        configured value for the other widgets.
+        """
 
         blue = 0
         if current_score > 0:
             green = 255
-            red = int(np.ceil((1 - (current_score / total_score)) * 255))
+            red = int(math.ceil((1 - (current_score / total_score)) * 255))
         elif current_score < 0:
-            green = int(np.ceil((1 - (-current_score / total_score)) * 255))
+            green = int(math.ceil((1 - (-current_score / total_score)) * 255))
             red = 255
         else:
             green = 255
@@ -59,49 +86,157 @@ class UiComponents:
 
         colour = '#' + ''.join(f'{i:02X}' for i in (red, green, blue))
 
-        current_settings = toml.load(".streamlit/config.toml")
-        if current_settings["theme"]["primaryColor"] != colour:
-            current_settings["theme"]["primaryColor"] = colour
-            with open(file=".streamlit/config.toml", mode="w",
-                      encoding="utf-8") as file:
-                toml.dump(current_settings, file)
-            st.experimental_rerun()
+        st.markdown(
+            f"""<span id="{SCORE_MARKER}"></span><style>
+            {SCORE_BLOCK} div[data-baseweb="slider"] div[role="slider"] {{
+                background-color: {colour};
+                box-shadow: none;
+            }}
+            {SCORE_BLOCK} div[data-baseweb="slider"] div[role="slider"] > div,
+            {SCORE_BLOCK} div[data-testid="stTickBar"] > div {{
+                color: {colour};
+            }}
+            </style>""",
+            unsafe_allow_html=True)
 
     @classmethod
     def _score_display(cls, score: int, total_score: int) -> None:
-        """Method for displaying the UI for the score"""
+        """Method for displaying the UI for the score, in a container of
+        its own so its colour reaches no other slider
+        """
 
-        st.slider(label="Score",
-                  min_value=-total_score, max_value=total_score,
-                  value=score)
-        cls._color_config(current_score=score, total_score=total_score)
+        with st.container():
+            cls._color_config(current_score=score, total_score=total_score)
+            st.slider(label="Score",
+                      min_value=-total_score, max_value=total_score,
+                      value=score)
 
     @classmethod
-    def _create_objective_forms(cls, tasks: dict, section: str) -> None:
-        """Method for displaying the UI for the task forms"""
+    def _create_objective_forms(cls, values: dict, section: str) -> None:
+        """Method for displaying the UI for the task forms of a section,
+        built from the values of its tasks
+        """
+
+        objective_types = {
+            "basic": BasicObjective,
+            "plan": PlanObjective,
+            "write": WriteObjective
+        }
+        config = ConstantConfig.get()
+        objectives = []
+        for action, value in values.items():
+            objective_type, kwargs = config.objective(name=action)
+            objectives.append(objective_types[objective_type](
+                section=section, name=action, value=value, **kwargs))
+
+        batched = []
+        if objectives and st.checkbox(label="Batch mode",
+                                      key=f"batch_mode_{section}"):
+            batched = [objective for objective in objectives
+                       if objective.BATCHABLE and not objective.recorded]
+        for objective in objectives:
+            if objective not in batched:
+                objective.display()
+        if batched:
+            cls._batch_form(objectives=batched, section=section)
 
-        special = toml.load(constant_file())["Special"]
-        actions = tasks[section]
-        for action in actions:
-            objective_types = {
-                "basic": BasicObjective,
-                "plan": PlanObjective,
-                "write": WriteObjective
-            }
-            kwargs = {"section": section, "name": action}
+    @classmethod
+    def _batch_form(cls, objectives: list, section: str) -> None:
+        """Method for displaying one form recording every given task of
+        a section with a single write and rerun
+        """
+
+        with st.form(key=f"batch_{section}"):
+            values = [(objective.name, objective.batch_display())
+                      for objective in objectives]
+            submit = st.form_submit_button(label="Record all")
+        if submit:
+            Logs.set_action_values(updates=[
+                (section, name, value) for name, value in values
+                if value is not None])
+            rerun()
 
-            if special.get(action, ["", ])[0] == "p":
-                objective_type = "plan"
+    @classmethod
+    def _stats_display(cls) -> None:
+        """Method for displaying the statistics of the tasks, charted from
+        the stored statistics instead of the log
+        """
+
+        stats = {task: task_stats
+                 for task, task_stats in Logs.task_stats().items()
+                 if not task.startswith("planned-") and task_stats.recorded}
+        st.header("Statistics")
+        if not stats:
+            st.info("No tasks have been recorded yet")
+            return
 
-            elif special.get(action, ["", ])[0] == "w":
-                objective_type = "write"
-                kwargs["to_write"] = special[action][1]
+        st.bar_chart(data={"Success rate": {
+            cls._task_label(task): task_stats.actioned / task_stats.recorded
+            for task, task_stats in stats.items()}})
+        task = st.selectbox(label="Task", options=list(stats),
+                            format_func=cls._task_label, key="stats_task")
+        task_stats = stats[task]
+        current, longest = st.columns(2)
+        current.metric(label="Current Streak",
+                       value=task_stats.current_streak)
+        longest.metric(label="Longest Streak", value=task_stats.longest)
+        actioned, undoable, avoided = st.columns(3)
+        actioned.metric(label="Actioned", value=task_stats.actioned)
+        undoable.metric(label="Undoable", value=task_stats.undoable)
+        avoided.metric(label="Avoided", value=task_stats.avoided)
+        # numbered so the chart keeps the weekdays in order
+        st.bar_chart(data={"Success rate": {
+            f"{index + 1} {day}": rate or 0 for index, (day, rate)
+            in enumerate(zip(WEEKDAYS, task_stats.success_rates))}})
 
-            else:
-                objective_type = "basic"
-
-            objective = objective_types[objective_type](**kwargs)
-            objective.display()
+    @classmethod
+    def _projection_display(cls) -> None:
+        """Method for displaying percentile bands of the progress projected
+        from the task statistics, next to the median of always actioning a
+        chosen task
+        """
+
+        st.header("Projection")
+        horizon = st.slider(label="Days ahead", min_value=7, max_value=730,
+                            value=365, key="projection_horizon")
+        config = ConstantConfig.get()
+        tasks = list(dict.fromkeys(column for day in config.days
+                                   for column in config.day_columns(day=day)))
+        always = st.selectbox(
+            label="What if I always complete", options=[None, *tasks],
+            format_func=lambda task: "No change" if task is None
+            else cls._task_label(task), key="projection_always")
+
+        projection = Logs.projection(horizon=horizon)
+        # iso dates so the chart keeps them in order
+        dates = [f"{date[6:]}-{date[3:5]}-{date[:2]}"
+                 for date in projection.dates]
+        data = {f"{percentile}th percentile": dict(zip(dates, band))
+                for percentile, band in zip(projection.percentiles,
+                                            projection.bands)}
+        median = projection.band(percentile=50)[-1]
+        scenario = None
+        if always is not None:
+            scenario = Logs.projection(horizon=horizon, always=always)
+            data[f"Median always completing {cls._task_label(always)}"] = \
+                dict(zip(dates, scenario.band(percentile=50)))
+        st.line_chart(data=data)
+
+        median_col, scenario_col = st.columns(2)
+        median_col.metric(
+            label=f"Median on {projection.dates[-1]}",
+            value=cls._value_as_string(median),
+            delta=f"{round((median / projection.start_value - 1) * 100, 2)}%")
+        if scenario is not None:
+            scenario_median = scenario.band(percentile=50)[-1]
+            scenario_col.metric(
+                label="Median always completing it",
+                value=cls._value_as_string(scenario_median),
+                delta=f"{round((scenario_median / median - 1) * 100, 2)}%")
+        st.caption(f"{Logs.PROJECTION_PATHS} simulated paths from "
+                   f"{cls._value_as_string(projection.start_value)} at the "
+                   f"end of {projection.start_date}, with every task "
+                   "recorded like its history on that weekday")
 
     @classmethod
     @st.experimental_memo
@@ -112,11 +247,37 @@ class UiComponents:
             return file.read()
 
     @classmethod
-    def _get_log_data(cls) -> str:
-        """Method for getting the data from the log file"""
-
-        with open(file=log_file(), mode="r", encoding="utf-8") as file:
-            return file.read()
+    def _export_options(cls, min_date: str, max_date: str) -> None:
+        """Displays the sidebar UI for exporting the log, which is only
+        built once asked for
+        """
+
+        with st.sidebar.expander(label="Download Log"):
+            first = datetime.strptime(min_date, "%d/%m/%Y").date()
+            last = datetime.strptime(max_date, "%d/%m/%Y").date()
+            selected = st.date_input(label="Dates", value=(first, last),
+                                     min_value=first, max_value=last,
+                                     key="export_dates")
+            sections = st.multiselect(label="Sections", options=SECTIONS,
+                                      key="export_sections")
+            long_format = st.checkbox(label="Long format",
+                                      key="export_long_format")
+            compress = st.checkbox(label="Gzip", key="export_compress")
+            if not st.button(label="Prepare Download", key="export_prepare"):
+                return
+
+            if len(selected) == 1:
+                selected = (selected[0], selected[0])
+            options = ExportOptions(start=selected[0].strftime("%d/%m/%Y"),
+                                    end=selected[1].strftime("%d/%m/%Y"),
+                                    sections=tuple(sections),
+                                    long_format=long_format,
+                                    compress=compress)
+            st.download_button(label="Download",
+                               data=Logs.export_log(options=options),
+                               file_name=options.file_name,
+                               mime=options.mime,
+                               key="downloader")
 
     @classmethod
     def _update_constant(cls) -> None:
@@ -127,28 +288,23 @@ class UiComponents:
             # To read file as bytes:
             bytes_data = uploaded_file.getvalue()
 
-            with open(file=constant_file(), mode="wb") as file:
-                file.write(bytes_data)
-            try:
-                with open(file=log_file(), mode="r",
-                          encoding="utf-8") as file:
-                    lines = file.readlines()
-                    print(lines)
-                with open(file=log_file(), mode="w",
-                          encoding="utf-8") as file:
-                    for line in lines[:-2]:
-                        file.write(line)
-            except FileNotFoundError:
-                pass
+            Logs.set_constant(data=bytes_data)
 
     @classmethod
     def _update_log(cls) -> None:
         """Updates the log file to what was uploaded"""
 
-        if st.session_state[log_file()] is not None:
-            pd.read_csv(filepath_or_buffer=st.session_state[log_file()],
-                        index_col="date"
-                        ).to_csv(path_or_buf=log_file())
+        if st.session_state[log_file()] is None:
+            return
+        mode = st.session_state.get("log_upload_mode", "Replace")
+        if mode == "Replace":
+            Logs.replace_log(path_or_buffer=st.session_state[log_file()])
+            st.session_state.pop("import_report", None)
+        else:
+            st.session_state["import_report"] = Logs.merge_log(
+                path_or_buffer=st.session_state[log_file()],
+                policy=NEWEST_WINS if mode == "Merge, newest wins"
+                else KEEP_EXISTING)
 
     @classmethod
     def _upload_options(cls) -> None:
@@ -163,9 +319,19 @@ class UiComponents:
             _ = st.file_uploader(label="Update Log", type="csv",
                                  key=log_file(),
                                  on_change=cls._update_log)
+        st.sidebar.radio(label="Log upload",
+                         options=["Replace", "Merge, newest wins",
+                                  "Merge, keep existing"],
+                         key="log_upload_mode", horizontal=True)
+        report = st.session_state.get("import_report")
+        if report is not None:
+            st.sidebar.caption(f"Merged log: {report.inserted} inserted, "
+                               f"{report.updated} updated, "
+                               f"{report.rejected} rejected")
 
     @classmethod
-    def _show_objectives(cls, day: str, date: str) -> None:
+    def _show_objectives(cls, day: str, date: str, min_date: str,
+                         max_date: str) -> None:
 
         st.title(f"{day} {date}")
         info = Logs.basic_info()
@@ -173,28 +339,32 @@ class UiComponents:
                            new_progress=info["new_progress"])
         cls._score_display(score=info["score"], total_score=info["total_score"])
 
-        tasks = Logs.get_actions()
-
-        with st.expander(label="Morning"):
-            cls._create_objective_forms(tasks=tasks, section="morning", )
-        with st.expander(label="Specific"):
-            general_tab, food_tab, planned_tab = st.tabs(
-                ["General", "Food", "Planned"])
-            with general_tab:
-                cls._create_objective_forms(tasks=tasks, section="general", )
-            with food_tab:
-                cls._create_objective_forms(tasks=tasks, section="food", )
-            with planned_tab:
-                cls._create_objective_forms(tasks=tasks, section="planned", )
-        with st.expander(label="Evening"):
-            cls._create_objective_forms(tasks=tasks, section="evening", )
-
-        st.sidebar.download_button(label="Download Log",
-                                   data=cls._get_log_data(),
-                                   file_name="day_tracker_log.csv",
-                                   mime="text/csv",
-                                   key="downloader")
+        values = Logs.get_action_values()
+
+        def section_label(section: str) -> str:
+            """Function for labelling a section with its open tasks"""
+
+            remaining = sum(value == "None"
+                            for value in values[section].values())
+            return f"{section.capitalize()} ({remaining})"
+
+        # only the chosen section is built, so a click in one section
+        # does not pay for the objectives of the others
+        section = st.radio(label="Section", options=DISPLAY_SECTIONS,
+                           format_func=section_label, horizontal=True,
+                           key="section")
+        cls._create_objective_forms(values=values[section], section=section)
+        if st.sidebar.checkbox(label="Show Statistics", key="show_stats"):
+            cls._stats_display()
+        if st.sidebar.checkbox(label="Show Projection",
+                               key="show_projection"):
+            cls._projection_display()
+
+        cls._export_options(min_date=min_date, max_date=max_date)
         cls._upload_options()
+        st.sidebar.caption(
+            f"Log parses this render: {LogSnapshot.get().parses}")
+        Instrumentation.display()
 
     @classmethod
     def display(cls) -> None:
@@ -211,17 +381,49 @@ class UiComponents:
                                  on_change=cls._update_constant)
             return
 
+        LogSnapshot.get().start_render()
         current_time = datetime.now()
         current_date = current_time.strftime("%d/%m/%Y")
 
-        min_date = Logs.config(date=current_date)
+        # missing days are created in the background, the page only waits
+        # a moment for them and otherwise shows the days that are ready
+        Rollover.watch(user=current_user())
+        try:
+            min_date, max_date = Logs.date_range()
+        except FileNotFoundError:
+            min_date = max_date = None
+        rollover = None
+        if max_date is None or sort_key(max_date) < sort_key(current_date):
+            rollover = Rollover.start(user=current_user(), date=current_date)
+            if Rollover.wait(job=rollover, timeout=Rollover.WAIT):
+                report = rollover.result()
+                if report is not None:
+                    st.sidebar.caption(f"Added {report.rows} days to the log "
+                                       f"in {report.seconds:.3f}s")
+                min_date, max_date = Logs.date_range()
+                rollover = None
+            elif max_date is None:
+                st.info("Creating the log...")
+                Rollover.wait(job=rollover)
+                rerun()
+            else:
+                st.sidebar.info(f"Adding the days up to {current_date} to "
+                                f"the log, showing up to {max_date} until "
+                                "then")
+
         min_value = datetime.date(
             datetime.strptime(min_date, "%d/%m/%Y"))
-        selected = st.sidebar.date_input(label="Select Day", value=current_time,
+        max_value = datetime.date(
+            datetime.strptime(max_date, "%d/%m/%Y"))
+        selected = st.sidebar.date_input(label="Select Day", value=max_value,
                                          min_value=min_value,
-                                         max_value=current_time)
+                                         max_value=max_value)
         selected_day = (selected.strftime("%A"))
         selected_date = (selected.strftime("%d/%m/%Y"))
         Logs.set_date(selected_date)
 
-        cls._show_objectives(day=selected_day, date=selected_date)
+        cls._show_objectives(day=selected_day, date=selected_date,
+                             min_date=min_date, max_date=max_date)
+        if rollover is not None:
+            Rollover.wait(job=rollover)
+            rerun()
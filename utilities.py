@@ -1,116 +1,455 @@
 """Module for most things log related"""
 
-from datetime import datetime
-from typing import Union, Tuple
+from datetime import datetime, timedelta
+from typing import Dict, List, NamedTuple, Optional, Set, Tuple, Union
 
 import math
-import pandas as pd
-import toml
+import time
 
-from filenames import constant_file, log_file, planned_file
+from constant_config import ConstantConfig
+from filenames import current_user
+from instrumentation import timed
+from log_export import ExportOptions, LogExport
+from log_import import NEWEST_WINS, ImportReport, LogImport
+from projection import Projection, Simulation, project
+from storage import get_backend, user_lock
+from storage_backend import Checkpoint, StorageBackend
+from task_matrix import UNRECORDED, TaskMatrix, month_key, sort_key
+from task_stats import TaskStats, fold_stats, log_stats, month_stats
 
 
+class LogSnapshot:
+    """Class holding in-memory copies of the months of the log a session
+    reads, the storage backend is only asked again for a month when it has
+    changed
+
+    Every change made through it also keeps the stored task statistics up
+    to date, the statistics of each month and a history folding together
+    the months before the latest one.
+    """
+
+    def __init__(self, backend: StorageBackend):
+        """Constructor method for the class"""
+
+        self._backend = backend
+        self._months: Dict[str, TaskMatrix] = {}
+
+    @classmethod
+    def get(cls) -> "LogSnapshot":
+        """Method for getting the snapshot of the current user's log,
+        creating it in the session state if needed
+        """
+
+        # only sessions need streamlit, scripts create their snapshots
+        # pylint: disable=import-outside-toplevel
+        import streamlit as st
+
+        key = f"snapshot_{current_user()}"
+        if key not in st.session_state:
+            st.session_state[key] = cls.create()
+        return st.session_state[key]
+
+    @classmethod
+    def create(cls) -> "LogSnapshot":
+        """Method for creating a new snapshot of the current user's log"""
+        return cls(backend=get_backend())
+
+    @property
+    def parses(self) -> int:
+        """The number of times a month was loaded in full this render"""
+        return self._backend.loads
+
+    def start_render(self) -> None:
+        """Method for resetting the parse counter at the start of a render"""
+        self._backend.loads = 0
+
+    @property
+    def matrix(self) -> TaskMatrix:
+        """The whole log matrix, always loaded from storage"""
+        return self._backend.load_log()
+
+    def month(self, month: str) -> TaskMatrix:
+        """Method for getting the matrix of a YYYY-mm month,
+        loaded again only if it has changed
+        """
+
+        self._months[month] = self._backend.sync_month(
+            month=month, matrix=self._months.get(month))
+        return self._months[month]
+
+    def checkpoints(self) -> List[Checkpoint]:
+        """Method for getting the checkpoint of every month in order"""
+        return self._backend.read_checkpoints()
+
+    def write_checkpoints(self, checkpoints: List[Checkpoint]) -> None:
+        """Method for storing checkpoints with their progress worked out"""
+        self._backend.write_checkpoints(checkpoints=checkpoints)
+
+    def append(self, date: str,
+               entries: List[Tuple[str, Union[str, int]]]) -> None:
+        """Method for recording (column, value) entries of a date
+        with a single write
+        """
+
+        month = month_key(date)
+        matrix = self.month(month=month)
+        # stored first, so a failed write never shows in the session
+        self._backend.record(date=date, entries=entries)
+        for column, value in entries:
+            matrix.set(date=date, column=column, value=value)
+        self._update_stats(matrices={month: matrix},
+                           columns=[column for column, _ in entries])
+
+    def write(self, matrix: TaskMatrix) -> None:
+        """Method for replacing the stored log"""
+
+        self._backend.write(matrix=matrix)
+        self._months = {}
+        self.rebuild_stats(matrix=matrix)
+
+    def write_months(self, matrix: TaskMatrix) -> None:
+        """Method for replacing the stored months that matrix holds"""
+
+        self._backend.write_months(matrix=matrix)
+        self._months = {}
+        self._update_stats(matrices={
+            month: matrix.select(start=start, stop=stop)
+            for month, start, stop in matrix.months()})
+
+    def extend(self, matrix: TaskMatrix) -> None:
+        """Method for adding dates after the latest stored date,
+        the statistics history moves on to the new latest month
+        """
+
+        self._backend.extend(matrix=matrix)
+        self._months = {}
+        try:
+            through, history = self._backend.read_stats_history()
+        except FileNotFoundError:
+            return
+        self._advance_history(through=through, history=history,
+                              latest=self.checkpoints()[-1].month)
+
+    def drop_latest(self, count: int) -> None:
+        """Method for removing the latest count dates, only the months
+        holding them are rewritten or deleted
+        """
+
+        checkpoints = self.checkpoints()
+        months = []
+        for checkpoint in reversed(checkpoints):
+            matrix = self.month(month=checkpoint.month)
+            months.append(checkpoint.month)
+            if len(matrix.dates) > count:
+                break
+            count -= len(matrix.dates)
+        else:
+            self.delete()
+            return
+
+        if len(months) > 1:
+            self._backend.delete_months(months=months[:-1])
+        kept = matrix.head(len(matrix.dates) - count)
+        self._backend.write_months(matrix=kept)
+        self._months = {}
+        self._backend.write_month_stats(
+            stats={months[-1]: month_stats(matrix=kept)})
+        # the kept month is now the latest, so it leaves the history
+        try:
+            through, _ = self._backend.read_stats_history()
+        except FileNotFoundError:
+            return
+        if through >= months[-1]:
+            self._backend.write_stats_history(through="", stats={})
+
+    def delete(self) -> None:
+        """Method for deleting the stored log"""
+
+        self._backend.delete_log()
+        self._months = {}
+
+    def stats(self) -> Dict[str, TaskStats]:
+        """Method for getting the statistics of every task over the log,
+        from the stored history of the months before the latest one and
+        the stored statistics of the latest month
+        """
+
+        latest = self.checkpoints()[-1].month
+        try:
+            through, history = self._backend.read_stats_history()
+        except FileNotFoundError:
+            self.rebuild_stats(matrix=self.matrix)
+            through, history = self._backend.read_stats_history()
+        history = self._advance_history(through=through, history=history,
+                                        latest=latest)
+        return fold_stats([history, self._month_stats(month=latest)])
+
+    def rebuild_stats(self, matrix: TaskMatrix) -> None:
+        """Method for working out and storing every statistic of the whole
+        log matrix in one pass
+        """
+
+        stats = log_stats(matrix=matrix)
+        months = sorted(stats)
+        self._backend.write_month_stats(stats=stats)
+        self._backend.write_stats_history(
+            through=months[-2] if len(months) > 1 else "",
+            stats=fold_stats(stats[month] for month in months[:-1]))
+
+    def _month_stats(self, month: str) -> Dict[str, TaskStats]:
+        """Method for getting the stored statistics of a month,
+        worked out and stored when missing
+        """
+
+        try:
+            return self._backend.read_month_stats(month=month)
+        except FileNotFoundError:
+            stats = month_stats(matrix=self.month(month=month))
+            self._backend.write_month_stats(stats={month: stats})
+            return stats
+
+    def _advance_history(self, through: str, history: Dict[str, TaskStats],
+                         latest: str) -> Dict[str, TaskStats]:
+        """Method for folding the months after through and before latest
+        into the statistics history, storing it if any were
+        """
+
+        months = [checkpoint.month for checkpoint in self.checkpoints()
+                  if through < checkpoint.month < latest]
+        if months:
+            history = fold_stats([history, *map(self._month_stats, months)])
+            self._backend.write_stats_history(through=months[-1],
+                                              stats=history)
+        return history
+
+    def _update_stats(self, matrices: Dict[str, TaskMatrix],
+                      columns: Optional[List[str]] = None) -> None:
+        """Method for storing the statistics of changed months by month,
+        only those of columns if given, clearing the history when it
+        already holds any of the months
+        """
+
+        stats = {}
+        for month, matrix in matrices.items():
+            stored = None
+            if columns is not None:
+                try:
+                    stored = self._backend.read_month_stats(month=month)
+                except FileNotFoundError:
+                    pass
+            stats[month] = month_stats(matrix=matrix) if stored is None \
+                else {**stored, **month_stats(matrix=matrix, columns=columns)}
+        self._backend.write_month_stats(stats=stats)
+        if min(matrices) < self.checkpoints()[-1].month:
+            try:
+                through, _ = self._backend.read_stats_history()
+            except FileNotFoundError:
+                return
+            if through >= min(matrices):
+                self._backend.write_stats_history(through="", stats={})
+
+
+class BackfillReport(NamedTuple):
+    """Report of the days added to the log by a backfill"""
+
+    rows: int
+    seconds: float
+
+
+class BatchReport(NamedTuple):
+    """Report of a batch of records applied to one user's log"""
+
+    user: str
+    recorded: int
+    rejected: int
+    days_added: int
+    months_written: int
+    seconds: float
+
+
+class UserSummary(NamedTuple):
+    """Summary of one user's whole log, a date is active when any of its
+    tasks was recorded and progress is the value at the end of last_date
+    """
+
+    user: str
+    first_date: str
+    last_date: str
+    days: int
+    active_days: int
+    scheduled: int
+    recorded: int
+    actioned: int
+    avoided: int
+    progress: float
+
+    @property
+    def completion_rate(self) -> float:
+        """The share of the scheduled tasks that were actioned"""
+        return self.actioned / self.scheduled if self.scheduled else 0.0
+
+
+# every entry point of the app and the scripts into the log
+# pylint: disable=too-many-public-methods
 class Logs:
     """Class containing log related methods"""
 
     DATE = None
+    MERGE_RECORD_LIMIT = 100
+    PROJECTION_PATHS = 10000
 
     @classmethod
     def check_constant(cls) -> bool:
         """Checks whether the constant file exists"""
 
         try:
-            _ = toml.load(constant_file())
+            _ = ConstantConfig.get()
             return True
         except FileNotFoundError:
             return False
 
     @classmethod
-    def _create_day_dataframe(cls, day: str, date: str) -> pd.DataFrame:
-        """Method for a creating day's dataframe"""
+    def _take_planned_values(cls, backend: StorageBackend) -> list:
+        """Method for getting the planned tasks,
+        then wiping them from the plan file
+        """
 
-        def tasks_to_dict(tasks: list, prefix) -> dict:
-            """Places a task list into a suitable dictionary"""
-            return {
-                f"{prefix}-{task_name}": ["None"]
-                for task_name in tasks}
+        planned = backend.read_planned()
+        backend.write_planned(tasks=[])
+        return planned
 
-        def planned_dict() -> dict:
-            """Create a dictionary from planned actions,
-            then wipes planned actions"""
-
-            try:
-                planned = toml.load(planned_file())
-            except FileNotFoundError:
-                planned = {"tasks": []}
-            with open(file=planned_file(), mode="w",
-                      encoding="utf-8") as plan_file:
-                toml.dump({"tasks": []}, plan_file)
-            return tasks_to_dict(tasks=planned["tasks"], prefix="planned")
-
-        actions = toml.load(constant_file())
-
-        day_dataframe = pd.DataFrame(data={
-            "date": [date],
-            **tasks_to_dict(tasks=actions["morning"], prefix="morning"),
-            **tasks_to_dict(tasks=actions["evening"], prefix="evening"),
-            **tasks_to_dict(tasks=actions[day]["general"], prefix="general"),
-            **tasks_to_dict(tasks=actions[day]["food"], prefix="food"),
-            **planned_dict(),
-        })
-
-        return day_dataframe.set_index("date", drop=True)
+    @classmethod
+    def _create_days_matrix(
+            cls, days: List[Tuple[str, str]],
+            backend: Optional[StorageBackend] = None) -> TaskMatrix:
+        """Method for creating the matrix of many (day, date) pairs at once,
+        adding the planned tasks to the first day only, for the user of
+        backend if given and the current user otherwise
+        """
+
+        if backend is None:
+            backend, config = get_backend(), ConstantConfig.get()
+        else:
+            config = ConstantConfig.read(backend=backend)
+
+        weekday_columns = {day: config.day_columns(day=day)
+                           for day in {day for day, _ in days}}
+        day_columns = [weekday_columns[day] for day, _ in days]
+        if days:
+            day_columns[0] = [
+                *day_columns[0],
+                *[f"planned-{task}"
+                  for task in cls._take_planned_values(backend=backend)]]
+        return TaskMatrix.from_schedule(dates=[date for _, date in days],
+                                        day_columns=day_columns)
 
     @classmethod
-    def _log_setup(cls) -> pd.DataFrame:
-        """Method for creating/getting the log file"""
+    def _log_setup(cls, snapshot: LogSnapshot, date: str,
+                   backend: Optional[StorageBackend] = None
+                   ) -> List[Checkpoint]:
+        """Method for creating/getting the log file, started on date,
+        returning the checkpoints of its months
+        """
 
         try:
-            return pd.read_csv(filepath_or_buffer=log_file(),
-                               index_col="date")
+            return snapshot.checkpoints()
         except FileNotFoundError:
-            day = datetime.now().strftime("%A")
-            date = datetime.now().strftime("%d/%m/%Y")
-            cls._create_day_dataframe(day=day, date=date
-                                      ).to_csv(path_or_buf=log_file())
-            return cls._create_day_dataframe(day=day, date=date)
+            day = datetime.strptime(date, "%d/%m/%Y").strftime("%A")
+            snapshot.write(matrix=cls._create_days_matrix(
+                days=[(day, date)], backend=backend))
+            return snapshot.checkpoints()
 
     @classmethod
-    def _update_log_file(cls, date: str,
-                         existing_dataframe: pd.DataFrame) -> None:
-        """Method for updating the log file"""
-        dates = [(date.strftime("%A"), date.strftime("%d/%m/%Y")) for date in
-                 pd.date_range(
-                     start=cls._get_max_date(dataframe=existing_dataframe),
-                     end=date
-                 )][1:]
+    def _days_between(cls, first: datetime,
+                      last: datetime) -> List[Tuple[str, str]]:
+        """Method for getting the (day, date) pairs from first to last"""
 
-        day_dataframes = [cls._create_day_dataframe(day=date[0], date=date[1]
-                                                    ) for date in dates]
+        return [(day.strftime("%A"), day.strftime("%d/%m/%Y"))
+                for day in (first + timedelta(days=offset)
+                            for offset in range((last - first).days + 1))]
 
-        new_dataframe = pd.concat([existing_dataframe, *day_dataframes],
-                                  join="outer")
-        new_dataframe.to_csv(path_or_buf=log_file())
+    @classmethod
+    def _update_log_file(cls, snapshot: LogSnapshot, date: str,
+                         max_date: str,
+                         backend: Optional[StorageBackend] = None
+                         ) -> BackfillReport:
+        """Method for updating the log file with every day after the latest
+        logged day up to date, built and written in a single batch
+        """
+
+        start_time = time.perf_counter()
+        days = cls._days_between(
+            first=datetime.strptime(max_date, "%d/%m/%Y") + timedelta(days=1),
+            last=datetime.strptime(date, "%d/%m/%Y"))
+
+        if days:
+            snapshot.extend(matrix=cls._create_days_matrix(days=days,
+                                                           backend=backend))
+        return BackfillReport(rows=len(days),
+                              seconds=time.perf_counter() - start_time)
 
     @classmethod
-    def _get_min_date(cls, dataframe: pd.DataFrame) -> str:
+    def _get_min_date(cls, checkpoints: List[Checkpoint]) -> str:
         """Method for getting the earliest date of the log file"""
-        return dataframe.index[0]
+        return checkpoints[0].min_date
 
     @classmethod
-    def _get_max_date(cls, dataframe: pd.DataFrame) -> str:
+    def _get_max_date(cls, checkpoints: List[Checkpoint]) -> str:
         """Method for getting the latest date of the log file"""
-        return dataframe.index[-1]
+        return checkpoints[-1].max_date
+
+    @classmethod
+    def _roll_over(cls, snapshot: LogSnapshot, date: str,
+                   backend: Optional[StorageBackend] = None
+                   ) -> Tuple[List[Checkpoint], Optional[BackfillReport]]:
+        """Method for creating the log if needed and every day missing up
+        to date, returning the checkpoints from before any backfill and
+        the report of the backfill, None when the log already reaches date
+        """
+
+        checkpoints = cls._log_setup(snapshot=snapshot, date=date,
+                                     backend=backend)
+        max_date = cls._get_max_date(checkpoints=checkpoints)
+        if sort_key(max_date) >= sort_key(date):
+            return checkpoints, None
+        return checkpoints, cls._update_log_file(
+            snapshot=snapshot, date=date, max_date=max_date, backend=backend)
 
     @classmethod
+    @timed("Logs.config")
     def config(cls, date: str, ) -> str:
         """Method for setting up the log file"""
 
-        log_dataframe = cls._log_setup()
-        if cls._get_max_date(dataframe=log_dataframe) != date:
-            cls._update_log_file(date=date,
-                                 existing_dataframe=log_dataframe)
-        return cls._get_min_date(dataframe=log_dataframe)
+        with user_lock():
+            checkpoints, _ = cls._roll_over(snapshot=LogSnapshot.get(),
+                                            date=date)
+        return cls._get_min_date(checkpoints=checkpoints)
+
+    @classmethod
+    @timed("Logs.roll_over")
+    def roll_over(cls, user: str, date: str) -> Optional[BackfillReport]:
+        """Method for creating the log of a user given explicitly and every
+        day missing up to date, without the session so it can run on a
+        background thread, returning the report of any backfill
+        """
+
+        backend = get_backend(user=user)
+        with user_lock(user=user):
+            _, report = cls._roll_over(snapshot=LogSnapshot(backend=backend),
+                                       date=date, backend=backend)
+        return report
+
+    @classmethod
+    @timed("Logs.date_range")
+    def date_range(cls) -> Tuple[str, str]:
+        """Method for getting the earliest and latest dates of the log,
+        raises FileNotFoundError when there is no log yet
+        """
+
+        with user_lock(exclusive=False):
+            checkpoints = LogSnapshot.get().checkpoints()
+        return (cls._get_min_date(checkpoints=checkpoints),
+                cls._get_max_date(checkpoints=checkpoints))
 
     @classmethod
     def set_date(cls, date: str) -> None:
@@ -118,117 +457,435 @@ class Logs:
         cls.DATE = date
 
     @classmethod
-    def _get_values(cls, dataframe: pd.DataFrame, date: str) -> list:
-        """Method for returning a list of all task values from a given date"""
-        return [item for item in list(dataframe.loc[date]) if not pd.isnull(item)]
+    def _progress_before(
+            cls, month: str,
+            snapshot: Optional[LogSnapshot] = None) -> Tuple[float, float]:
+        """Method for getting the log progress and last delta of the months
+        before month from their checkpoints, working out and storing any
+        checkpoint a change has cleared, of the log of snapshot if given
+        and the current user's otherwise
+        """
+
+        snapshot = snapshot or LogSnapshot.get()
+        earlier = [checkpoint for checkpoint in snapshot.checkpoints()
+                   if checkpoint.month < month]
+        if not earlier:
+            return 0, 0
+        if earlier[-1].cumulative is None:
+            cumulative, updated = 0.0, []
+            for checkpoint in earlier:
+                if checkpoint.cumulative is None:
+                    if checkpoint.log_progress is None:
+                        deltas = snapshot.month(
+                            month=checkpoint.month).deltas()
+                        checkpoint = checkpoint._replace(
+                            log_progress=sum(map(math.log1p, deltas)),
+                            last_delta=deltas[-1])
+                    checkpoint = checkpoint._replace(
+                        cumulative=cumulative + checkpoint.log_progress)
+                    updated.append(checkpoint)
+                cumulative = checkpoint.cumulative
+            snapshot.write_checkpoints(checkpoints=updated)
+            earlier[-1] = checkpoint
+        return earlier[-1].cumulative, earlier[-1].last_delta
 
     @classmethod
-    def _get_score(cls, values: list) -> int:
-        """Method for getting the score from a list of values"""
-        return sum(int(item) for item in values if item != "None")
+    def _latest_progress(cls, snapshot: LogSnapshot) -> Tuple[str, float]:
+        """Method for getting the latest date of the log of snapshot and
+        the progress value at its end
+        """
+
+        latest = snapshot.checkpoints()[-1]
+        log_progress, _ = cls._progress_before(month=latest.month,
+                                               snapshot=snapshot)
+        log_progress += sum(map(math.log1p, snapshot.month(
+            month=latest.month).deltas()))
+        return latest.max_date, math.exp(log_progress)
 
     @classmethod
-    def _get_start_progress(cls, dataframe: pd.DataFrame) -> Tuple[float, float]:
-        """Method for getting the current progress value from the log file"""
-
-        multipliers = []
-        for date_index in dataframe.index:
-            if date_index == cls.DATE:
-                break
-            values = cls._get_values(dataframe=dataframe, date=date_index)
-            multipliers.append(
-                1 + (0.01 * (cls._get_score(values=values) / len(values))))
-
-        if not multipliers:
-            return 1, 0
-
-        delta = multipliers[-1] - 1
-        progress = math.prod(multipliers)
-        return progress, delta
+    def _get_start_progress(cls, matrix: TaskMatrix) -> Tuple[float, float]:
+        """Method for getting the current progress value from the
+        checkpoints of the earlier months and the month's earlier dates
+        """
+
+        position = matrix.position(cls.DATE)
+        log_progress, delta = cls._progress_before(month=month_key(cls.DATE))
+        if position:
+            deltas = matrix.deltas()[:position]
+            log_progress += sum(map(math.log1p, deltas))
+            delta = deltas[-1]
+        return math.exp(log_progress), delta
 
     @classmethod
-    def _get_new_progress(cls, dataframe: pd.DataFrame,
+    def _get_new_progress(cls, matrix: TaskMatrix,
                           start_value: float) -> Tuple[float, float]:
         """Method for getting the new progress
         value from the current progress and score"""
 
-        values = cls._get_values(dataframe=dataframe, date=cls.DATE)
-        new_delta = (0.01 * (cls._get_score(values=values) / len(values)))
+        new_delta = matrix.deltas()[matrix.position(cls.DATE)]
         multiplier = 1 + new_delta
         new_value = start_value * multiplier
         return new_value, new_delta
 
     @classmethod
+    @timed("Logs.basic_info")
     def basic_info(cls) -> dict:
         """Method for returning basic info from the log file"""
 
-        dataframe = pd.read_csv(filepath_or_buffer=log_file(),
-                                index_col="date")
-        values = cls._get_values(dataframe=dataframe, date=cls.DATE)
-        start_progress = cls._get_start_progress(dataframe=dataframe)
+        with user_lock(exclusive=False):
+            matrix = LogSnapshot.get().month(month=month_key(cls.DATE))
+            start_progress = cls._get_start_progress(matrix=matrix)
+        position = matrix.position(cls.DATE)
         return {
-            "score": cls._get_score(values),
-            "total_score": len(values),
+            "score": matrix.scores()[position],
+            "total_score": matrix.totals()[position],
             "start_progress": start_progress,
-            "new_progress": cls._get_new_progress(dataframe=dataframe,
+            "new_progress": cls._get_new_progress(matrix=matrix,
                                                   start_value=start_progress[0])
         }
 
     @classmethod
+    @timed("Logs.get_actions")
     def get_actions(cls) -> dict:
         """Method for returning available tasks from the log file"""
 
-        dataframe = pd.read_csv(filepath_or_buffer=log_file(),
-                                index_col="date")
-        actions = list(dataframe.loc[cls.DATE].dropna().index)
-        action_dict = {
-            "morning": [action.removeprefix("morning-") for action in actions if
-                        action.startswith("morning")],
-            "evening": [action.removeprefix("evening-") for action in actions if
-                        action.startswith("evening")],
-            "general": [action.removeprefix("general-") for action in actions if
-                        action.startswith("general")],
-            "food": [action.removeprefix("food-") for action in actions if
-                     action.startswith("food")],
-            "planned": [action.removeprefix("planned-") for action in actions if
-                        action.startswith("planned")],
-        }
-        return action_dict
+        return {section: list(values)
+                for section, values in cls.get_action_values().items()}
+
+    @classmethod
+    @timed("Logs.get_action_values")
+    def get_action_values(cls) -> Dict[str, Dict[str, Union[int, str]]]:
+        """Method for getting the value of every task of the date from
+        one lookup, as a dictionary of tasks for each section
+        """
+
+        values = {section: {} for section in
+                  ("morning", "evening", "general", "food", "planned")}
+        with user_lock(exclusive=False):
+            row = LogSnapshot.get().month(
+                month=month_key(cls.DATE)).row_values(date=cls.DATE)
+        for column, value in row.items():
+            section, name = column.split("-", 1)
+            if section in values:
+                values[section][name] = value
+        return values
 
     @classmethod
+    @timed("Logs.get_action_value")
     def get_action_value(cls, section: str, name: str) -> Union[int, str]:
         """Method for getting a task value from the log file"""
 
-        dataframe = pd.read_csv(filepath_or_buffer=log_file(),
-                                index_col="date")
-        return dataframe.loc[cls.DATE][f"{section}-{name}"]
+        with user_lock(exclusive=False):
+            return LogSnapshot.get().month(month=month_key(cls.DATE)).value(
+                date=cls.DATE, column=f"{section}-{name}")
 
     @classmethod
     def set_action_value(cls, section: str, name: str,
                          value: Union[str, int]) -> None:
         """Method for setting a task value in the log file"""
+        cls.set_action_values(updates=[(section, name, value)])
 
-        dataframe = pd.read_csv(filepath_or_buffer=log_file(),
-                                index_col="date")
-        dataframe.at[cls.DATE, f"{section}-{name}"] = value
-        dataframe.to_csv(path_or_buf=log_file())
+    @classmethod
+    @timed("Logs.set_action_values")
+    def set_action_values(
+            cls, updates: List[Tuple[str, str, Union[str, int]]]) -> None:
+        """Method for setting many (section, name, value) task values
+        in the log file with a single write
+        """
+
+        if not updates:
+            return
+        with user_lock():
+            LogSnapshot.get().append(date=cls.DATE, entries=[
+                (f"{section}-{name}", value)
+                for section, name, value in updates])
 
     @classmethod
-    def get_planned_values(cls) -> list:
-        """Method for getting the planned tasks from the plan file"""
+    @timed("Logs.task_stats")
+    def task_stats(cls) -> Dict[str, TaskStats]:
+        """Method for getting the statistics of every task over the log,
+        read from the stored statistics so history length does not matter
+        """
 
-        try:
-            return toml.load(planned_file())["tasks"]
-        except FileNotFoundError:
-            with open(file=planned_file(), mode="w", encoding="utf-8") as file:
-                toml.dump({"tasks": []}, file)
-            return []
+        with user_lock(exclusive=False):
+            return LogSnapshot.get().stats()
+
+    @classmethod
+    @timed("Logs.projection")
+    def projection(cls, horizon: int,
+                   always: Optional[str] = None) -> Projection:
+        """Method for projecting the progress over horizon days after the
+        latest date of the log from the task statistics, with the task
+        always actioned when given for a what-if scenario
+        """
+
+        with user_lock(exclusive=False):
+            snapshot = LogSnapshot.get()
+            latest_date, progress = cls._latest_progress(snapshot=snapshot)
+            stats = snapshot.stats()
+        config = ConstantConfig.get()
+        return project(stats=stats, day_columns={
+            day: config.day_columns(day=day) for day in config.days},
+            start_date=latest_date, start_value=progress,
+            simulation=Simulation(horizon=horizon,
+                                  paths=cls.PROJECTION_PATHS, always=always))
+
+    @classmethod
+    @timed("Logs.summary")
+    def summary(cls, user: str) -> UserSummary:
+        """Method for summarising the whole log of a user given explicitly,
+        without the session so it can run outside the app, scored and
+        progressed by the same rules as the app, raises FileNotFoundError
+        when the user has no log
+        """
+
+        snapshot = LogSnapshot(backend=get_backend(user=user))
+        with user_lock(user=user, exclusive=False):
+            matrix = snapshot.matrix
+            last_date, progress = cls._latest_progress(snapshot=snapshot)
+        indptr, values = matrix.indptr, matrix.values
+        unrecorded = values.count(UNRECORDED)
+        return UserSummary(
+            user=user, first_date=matrix.dates[0], last_date=last_date,
+            days=len(matrix.dates),
+            active_days=sum(
+                values[indptr[row]:indptr[row + 1]].count(UNRECORDED)
+                < indptr[row + 1] - indptr[row]
+                for row in range(len(matrix.dates))),
+            scheduled=len(values), recorded=len(values) - unrecorded,
+            actioned=values.count(1), avoided=values.count(-1),
+            progress=progress)
+
+    @classmethod
+    @timed("Logs.export_log")
+    def export_log(cls, options: ExportOptions = ExportOptions()) -> bytes:
+        """Method for returning the part of the log chosen by options,
+        with the journal applied, as csv data, loading only the months
+        within its dates
+        """
+
+        snapshot = LogSnapshot.get()
+        with user_lock(exclusive=False):
+            months = [snapshot.month(month=checkpoint.month)
+                      for checkpoint in snapshot.checkpoints()
+                      if options.covers(month=checkpoint.month)]
+        return LogExport.build(months=months, options=options)
+
+    @classmethod
+    @timed("Logs.recover_csv")
+    def recover_csv(cls) -> Tuple[bytes, List[str]]:
+        """Method for returning every month of the log that can still be
+        read as csv data, for when the app itself fails, along with the
+        months that could not be read and were left out
+        """
+
+        snapshot = LogSnapshot.create()
+        parts, skipped = [], []
+        with user_lock(exclusive=False):
+            for checkpoint in snapshot.checkpoints():
+                try:
+                    parts.append(snapshot.month(month=checkpoint.month))
+                except Exception:  # pylint:disable=broad-except
+                    skipped.append(checkpoint.month)
+        return LogExport.build(months=parts), skipped
+
+    @classmethod
+    @timed("Logs.replace_log")
+    def replace_log(cls, path_or_buffer) -> None:
+        """Method for replacing the log file with a csv,
+        discarding the journal
+        """
+
+        matrix = TaskMatrix.from_csv(path_or_buffer=path_or_buffer)
+        with user_lock():
+            LogSnapshot.get().write(matrix=matrix)
+
+    @classmethod
+    @timed("Logs.merge_log")
+    def merge_log(cls, path_or_buffer,
+                  policy: str = NEWEST_WINS) -> ImportReport:
+        """Method for merging a wide or long log csv into the log,
+        only the changed dates are written unless the csv adds dates or
+        changes more than MERGE_RECORD_LIMIT tasks, when only the months
+        it touches are written
+        """
+
+        snapshot = LogSnapshot.get()
+        with user_lock():
+            matrix = snapshot.matrix
+            merge = LogImport.merge(matrix=matrix, source=path_or_buffer,
+                                    config=ConstantConfig.get(),
+                                    policy=policy)
+            report = merge.report
+            if merge.matrix is None and (report.inserted + report.updated
+                                         <= cls.MERGE_RECORD_LIMIT):
+                for date, entries in merge.changes.items():
+                    snapshot.append(date=date, entries=entries)
+                return report
+
+            merged = merge.matrix
+            if merged is None:
+                merged = matrix
+                for date, entries in merge.changes.items():
+                    for column, value in entries:
+                        merged.set(date=date, column=column, value=value)
+            touched = {month_key(date) for date in merge.changes}
+            snapshot.write_months(matrix=TaskMatrix.concat([
+                merged.select(start=start, stop=stop)
+                for month, start, stop in merged.months()
+                if month in touched]))
+        return report
+
+    @classmethod
+    def _batch_dates(cls, records: List[Tuple[str, str, str, str]]
+                     ) -> Dict[str, datetime]:
+        """Method for parsing the dates of batch records,
+        leaving out those that are not dates or are after today
+        """
+
+        today = datetime.combine(datetime.now().date(), datetime.min.time())
+        parsed = {}
+        for date in {record[0] for record in records}:
+            try:
+                day = datetime.strptime(date, "%d/%m/%Y")
+            except ValueError:
+                continue
+            # no days are created after today, so later records are rejected
+            if day <= today:
+                parsed[date] = day
+        return parsed
+
+    @classmethod
+    def _batch_months(cls, snapshot: LogSnapshot,
+                      checkpoints: List[Checkpoint],
+                      added: Optional[TaskMatrix],
+                      months: Set[str]) -> Dict[str, TaskMatrix]:
+        """Method for getting the stored months among months by month,
+        with the days of added appended as months of their own or to them
+        """
+
+        stored = {checkpoint.month for checkpoint in checkpoints}
+        parts = {month: snapshot.month(month=month)
+                 for month in sorted(stored.intersection(months))}
+        for month, start, stop in added.months() if added else []:
+            part = added.select(start=start, stop=stop)
+            parts[month] = TaskMatrix.concat([parts[month], part]) \
+                if month in parts else part
+        return parts
+
+    @classmethod
+    def _apply_records(cls, parts: Dict[str, TaskMatrix],
+                       records: List[Tuple[str, str, str, str]],
+                       config: ConstantConfig) -> List[str]:
+        """Method for setting the valid records in the months of parts,
+        returning the month of each record set
+        """
+
+        validate = LogImport.validator(
+            matrix=TaskMatrix.concat([parts[month] for month in sorted(parts)]),
+            config=config)
+        recorded = []
+        for date, section, task, text in records:
+            column = f"{section}-{task}"
+            value = validate(date, column, text)
+            part = parts.get(month_key(date))
+            if value is None or part is None or date not in part.dates:
+                continue
+            part.set(date=date, column=column, value=value)
+            recorded.append(month_key(date))
+        return recorded
+
+    @classmethod
+    @timed("Logs.record_batch")
+    def record_batch(cls, user: str,
+                     records: List[Tuple[str, str, str, str]]) -> BatchReport:
+        """Method for recording (date, section, task, value) records for a
+        user given explicitly instead of the one viewing the app, the days
+        missing up to the latest record are created first and every month
+        the records touch is stored with a single write
+
+        Records are checked like an uploaded log and rejected when their
+        date is after today or not in the log, their value is unknown or
+        their task is neither in the log nor scheduled on that day.
+        """
+
+        start_time = time.perf_counter()
+        backend = get_backend(user=user)
+        snapshot = LogSnapshot(backend=backend)
+        config = ConstantConfig.read(backend=backend)
+        parsed = cls._batch_dates(records=records)
+
+        with user_lock(user=user):
+            try:
+                checkpoints = snapshot.checkpoints()
+            except FileNotFoundError:
+                checkpoints = []
+            days = []
+            if parsed:
+                days = cls._days_between(
+                    first=datetime.strptime(checkpoints[-1].max_date,
+                                            "%d/%m/%Y") + timedelta(days=1)
+                    if checkpoints else min(parsed.values()),
+                    last=max(parsed.values()))
+            added = cls._create_days_matrix(days=days, backend=backend) \
+                if days else None
+            changed = {month for month, _, _ in added.months()} \
+                if added else set()
+            parts = cls._batch_months(
+                snapshot=snapshot, checkpoints=checkpoints, added=added,
+                months=changed.union(map(month_key, parsed)))
+            recorded = cls._apply_records(parts=parts, records=records,
+                                          config=config)
+            changed.update(recorded)
+
+            if changed:
+                matrix = TaskMatrix.concat([parts[month]
+                                            for month in sorted(changed)])
+                if checkpoints:
+                    snapshot.write_months(matrix=matrix)
+                else:
+                    snapshot.write(matrix=matrix)
+        return BatchReport(user=user, recorded=len(recorded),
+                           rejected=len(records) - len(recorded),
+                           days_added=len(days), months_written=len(changed),
+                           seconds=time.perf_counter() - start_time)
+
+    @classmethod
+    @timed("Logs.set_constant")
+    def set_constant(cls, data: bytes) -> None:
+        """Method for replacing the constant file, the latest days of the log
+        are created again so they follow it
+        """
+
+        with user_lock():
+            get_backend().write_constant(data=data)
+            ConstantConfig.invalidate()
+            cls.drop_latest_days(count=2)
+
+    @classmethod
+    @timed("Logs.drop_latest_days")
+    def drop_latest_days(cls, count: int) -> None:
+        """Method for removing the latest days from the log,
+        so they are created again from the constant file
+        """
+
+        snapshot = LogSnapshot.get()
+        with user_lock():
+            try:
+                snapshot.drop_latest(count=count)
+            except FileNotFoundError:
+                return
+
+    @classmethod
+    @timed("Logs.get_planned_values")
+    def get_planned_values(cls) -> list:
+        """Method for getting the planned tasks"""
+        return get_backend().read_planned()
 
     @classmethod
+    @timed("Logs.set_planned_values")
     def set_planned_values(cls, task_list: list) -> None:
-        """Method for setting the planned tasks in plan file"""
+        """Method for setting the planned tasks"""
 
-        toml_data = toml.load(planned_file())
-        toml_data["tasks"] = task_list
-        with open(file=planned_file(), mode="w", encoding="utf-8") as file:
-            toml.dump(toml_data, file)
+        with user_lock():
+            get_backend().write_planned(tasks=task_list)